@@ -4,3 +4,31 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from app.hr_platform import join, send_events
+        from app.logic.archive import ResultsArchive
+        from app.logic.events import EventBus, GameEnded, PlayerQuit, Sink
+        from app.logic.rating import RatingBook
+        from app.logic.tournament import TournamentHub
+
+        bus = EventBus.instance()
+        bus.subscribe(Sink(
+            "hr_platform", send_events, (PlayerQuit, GameEnded), join=join
+        ))
+        bus.subscribe(Sink(
+            "archive",
+            lambda events: ResultsArchive.instance().append(events),
+            (GameEnded,),
+        ))
+        bus.subscribe(Sink(
+            "tournaments",
+            lambda events: TournamentHub.instance().on_games_ended(events),
+            (GameEnded,),
+            queue_size=TournamentHub.QUEUE_SIZE,
+        ))
+        bus.subscribe(Sink(
+            "ratings",
+            lambda events: RatingBook.instance().on_games_ended(events),
+            (GameEnded,),
+        ))
@@ -1,3 +1,4 @@
+import hmac
 import logging
 from datetime import datetime
 
@@ -24,12 +25,22 @@ def get_auth_header(request):
 
 class ExternalApiAuthentication(BaseAuthentication):
     def authenticate(self, request):
-        auth = get_auth_header(request)
-        if auth != settings.EXTERNAL_API_KEY:
-            raise exceptions.AuthenticationFailed("Invalid API key")
+        validate_api_key(get_auth_header(request))
         return None, None
 
 
+def validate_api_key(
+    key: str | None,
+    error_cls: type[Exception] = exceptions.AuthenticationFailed
+):
+    """Проверяет ключ платформы (без префикса Bearer)."""
+
+    if key is None or not hmac.compare_digest(
+        key.encode(), settings.EXTERNAL_API_KEY.encode()
+    ):
+        raise error_cls("Invalid API key")
+
+
 def validate_token(
     token: str,
     error_cls: type[Exception] = exceptions.AuthenticationFailed
@@ -135,7 +146,7 @@ class JWKeyCache:
         if key is not None:
             return key
 
-        logging.debug(f"Key_id {key_id} not found in cache, updating...")
+        logging.debug("Key_id %s not found in cache, updating...", key_id)
 
         self._update_keys()
 
@@ -1,29 +1,100 @@
 import asyncio
 import json
-from traceback import print_exc
+import logging
+import time
+from collections import deque
+from itertools import islice
 from typing import ClassVar, TYPE_CHECKING
+from urllib.parse import parse_qs
 from uuid import UUID
 
 from channels.consumer import AsyncConsumer
+from channels.exceptions import StopConsumer
+from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import APIException
 
-from app.auth import validate_token
+from app.auth import validate_api_key, validate_token
+from app.throttling import FloodError, TokenBucket
+from app.logic.timers import Timer, TimerScheduler
+
+logger = logging.getLogger(__name__)
+
+# Отказы по правилам игры и авторизации, а не ошибки сервера
+EXPECTED_ERRORS = (ValueError, APIException)
 
 if TYPE_CHECKING:
+    from app.logic.dashboard import DashboardFilter
+    from app.serializations import JWTContents
     from app.logic.game import Game
+    from app.logic.matchmaking import Ticket
     from app.logic.player import Player
 
 
+# Кадр с несколькими уже закодированными кадрами внутри
+BATCH_FRAME = '{{"action": "batch", "data": [{}], "is_success": true}}'
+
+
+def encode_message(
+    message: dict | str,
+    action: str,
+    is_success: bool = True,
+    game_id: UUID | None = None,
+) -> str:
+    frame = {
+        "action": action,
+        "data": message,
+        "is_success": is_success
+    }
+    if game_id is not None:
+        frame["game_id"] = game_id
+
+    return json.dumps(frame, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
 class BaseConsumer(AsyncConsumer):
+    # Размер кадра и общий лимит проверяются до разбора JSON,
+    # лимиты по действиям - сразу после
+    MAX_FRAME_SIZE = 4096
+    RATE_LIMIT: ClassVar[tuple[float, float]] = (20, 10)
+    ACTION_RATE_LIMITS: ClassVar[dict[str, tuple[float, float]]] = {}
+    MAX_VIOLATIONS = 20
+
+    HANDSHAKE_PROTOCOL = "bearer"
+
     def __init__(self):
         super().__init__()
 
         self.is_connected = False
+        self.subprotocol: str | None = None
         self.action: str = "root"
+        self.violations = 0
+        self.last_seen_at = time.monotonic()
+        self.heartbeat: Timer | None = None
+        # Пинги и разрыв молчащего соединения - только для ?heartbeat=1,
+        # живым соединение делает любой входящий кадр
+        self.is_heartbeat = False
+        # Клиент с ?batch=1 получает кадры одного тика одним кадром batch
+        self.is_batching = False
+        self.outbox: list[str] | None = None
+        self.bucket = TokenBucket(*self.RATE_LIMIT)
+        self.action_buckets = {
+            action: TokenBucket(*limit)
+            for action, limit in self.ACTION_RATE_LIMITS.items()
+        }
 
     async def receive(self, data: dict):
-        self.action = data['action']
-        handler = getattr(self, f'handle_{self.action}')
+        # Действие пришло от клиента: неизвестное - отказ, а не ошибка сервера
+        action = data.get('action')
+        handler = (
+            getattr(self, f'handle_{action}', None)
+            if isinstance(action, str) else None
+        )
+        if handler is None:
+            self.action = "root"
+            raise ValueError("Неизвестное действие")
+
+        self.action = action
         await handler(data.get('data'))
 
     async def error_catcher(self, error):
@@ -32,13 +103,48 @@ class BaseConsumer(AsyncConsumer):
     async def dispatch(self, message):
         try:
             await super().dispatch(message)
+        except StopConsumer:
+            raise
         except Exception as ex:
             await self.error_catcher(ex)
 
     async def accept_connection(self):
-        await self.send({
-            "type": "websocket.accept"
-        })
+        self.is_batching = self.get_query_flag('batch')
+        self.is_heartbeat = self.get_query_flag('heartbeat')
+
+        message = {"type": "websocket.accept"}
+        if self.subprotocol is not None:
+            message["subprotocol"] = self.subprotocol
+
+        await self.send(message)
+
+    def get_query_params(self) -> dict[str, list[str]]:
+        return parse_qs(self.scope.get('query_string', b'').decode())
+
+    def get_query_flag(self, name: str) -> bool:
+        value = self.get_query_params().get(name)
+        return bool(value) and value[0] in ("1", "true")
+
+    def get_handshake_token(self) -> str | None:
+        """Токен из ?token= или из Sec-WebSocket-Protocol: bearer, <token>."""
+
+        token = self.get_query_params().get('token')
+        if token:
+            return token[0]
+
+        protocols = self.scope.get('subprotocols') or []
+        if len(protocols) == 2 and protocols[0] == self.HANDSHAKE_PROTOCOL:
+            self.subprotocol = self.HANDSHAKE_PROTOCOL
+            return protocols[1]
+
+        return None
+
+    def authenticate_handshake(self) -> "JWTContents | None":
+        token = self.get_handshake_token()
+        if token is None:
+            return None
+
+        return validate_token(f"Bearer {token}")
 
     async def send_message(
         self,
@@ -47,47 +153,159 @@ class BaseConsumer(AsyncConsumer):
         is_success: bool = True
     ):
         action = action or self.action
-        data = json.dumps({
-            "action": action,
-            "data": message,
-            "is_success": is_success
-        }, ensure_ascii=False, cls=DjangoJSONEncoder)
+        await self.send_text(encode_message(message, action, is_success))
 
-        await self.send({
-            "type": "websocket.send",
-            "text": data
-        })
+    async def send_text(self, text: str):
+        if not self.is_batching:
+            await self.send({
+                "type": "websocket.send",
+                "text": text
+            })
+            return
+
+        if self.outbox is None:
+            self.outbox = []
+            asyncio.get_running_loop().create_task(self.flush_outbox())
+        self.outbox.append(text)
+
+    async def flush_outbox(self):
+        """Отправляет накопленное за тик: один кадр как есть, несколько - в batch."""
+
+        texts, self.outbox = self.outbox, None
+        if not texts:
+            return
+
+        try:
+            await self.send({
+                "type": "websocket.send",
+                "text": texts[0] if len(texts) == 1 else BATCH_FRAME.format(",".join(texts)),
+            })
+        except Exception:
+            # Отправка идёт в отдельной задаче, ошибку больше некому увидеть
+            logger.exception("Batched send of %s frames failed", len(texts))
 
     async def close_connection(self, event):
+        await self.flush_outbox()
         await self.send({
             "type": "websocket.close"
         })
 
+    async def handle_ping(self, data):
+        await self.send_message({}, "pong")
+
+    async def handle_pong(self, data):
+        pass
+
+    def arm_heartbeat(self):
+        self.heartbeat = TimerScheduler.instance().schedule(
+            settings.HEARTBEAT_INTERVAL, self.on_heartbeat
+        )
+
+    async def on_heartbeat(self):
+        if not self.is_connected:
+            return
+
+        if time.monotonic() - self.last_seen_at > settings.HEARTBEAT_TIMEOUT:
+            await self.reap()
+            return
+
+        self.arm_heartbeat()
+        await self.send_message({}, "ping")
+
+    def is_stale(self) -> bool:
+        """Соединение не отвечало дольше двух интервалов пинга."""
+
+        silence = time.monotonic() - self.last_seen_at
+        return not self.is_connected or silence > settings.HEARTBEAT_INTERVAL * 2
+
+    async def reap(self):
+        """Закрывает соединение без ответа и освобождает его место."""
+
+        await self.on_disconnect()
+        await self.close_connection(None)
+
     async def websocket_connect(self, event):
+        TimerScheduler.instance().bind(asyncio.get_running_loop())
         await self.accept_connection()
         self.is_connected = True
+        self.last_seen_at = time.monotonic()
+        if self.is_heartbeat:
+            self.arm_heartbeat()
+
+    async def on_violation(self, detail: str):
+        self.violations += 1
+        if self.violations >= self.MAX_VIOLATIONS:
+            self.is_connected = False
+            await self.close_connection(None)
+            return
+
+        raise FloodError(detail)
 
     async def websocket_receive(self, event):
+        if not self.is_connected:
+            return
+
+        self.last_seen_at = time.monotonic()
         text_data = event.get("text")
-        await self.receive(json.loads(text_data))
+        if text_data is None or len(text_data) > self.MAX_FRAME_SIZE:
+            await self.on_violation("Слишком большое сообщение")
+            return
+
+        if not self.bucket.consume():
+            await self.on_violation("Слишком много сообщений")
+            return
+
+        data = json.loads(text_data)
+        if not isinstance(data, dict):
+            raise ValueError("Неверный формат сообщения")
+
+        action = data.get('action')
+        bucket = self.action_buckets.get(action) if isinstance(action, str) else None
+        if bucket is not None and not bucket.consume():
+            await self.on_violation("Слишком много запросов этого действия")
+            return
+
+        await self.receive(data)
+
+    async def on_disconnect(self):
+        """Снимает соединение со всех реестров; повторный вызов безвреден."""
 
-    async def websocket_disconnect(self, event):
         self.is_connected = False
 
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+
+    async def websocket_disconnect(self, event):
+        await self.on_disconnect()
+        raise StopConsumer()
+
 
 class GameConsumer(BaseConsumer):
     connects: ClassVar[dict[tuple[UUID, UUID], "GameConsumer"]] = {}
 
+    ACTION_RATE_LIMITS = {
+        "auth": (3, 0.2),
+        "attack": (5, 2),
+    }
+    ERROR_DEBOUNCE = 5
+
+    # Кадры мультиплексированного соединения помечаются game_id
+    is_multiplexed = False
+
     def __init__(self):
         super().__init__()
         self.game_id: UUID | None = None
         self.player_id: UUID | None = None
         self.is_registered: bool = False
+        self.last_seq: int | None = None
+        # Только для FloodError
+        self.error_times: dict[str, float] = {}
 
     async def on_registered(self):
 
         _, player = self.get_game_and_player()
-        await player.on_connect()
+        await player.on_connect(self.last_seq)
 
     async def handle_auth(self, data: dict):
         if self.is_registered:
@@ -99,31 +317,74 @@ class GameConsumer(BaseConsumer):
 
     async def handle_attack(self, data: dict):
         game, player = self.get_game_and_player()
-        await player.attack(data)
+        await game.submit(lambda: player.attack(data))
 
     async def receive_game_players(
         self, game: "Game", data: dict, action: str | None = None
     ):
         action = action or self.action
+        text = encode_message(data, action)
+        tagged_text = None
 
-        coros = []
         for player in game.players:
             ws = self.connects.get((game.id, player.id))
             if not ws:
                 continue
 
-            coros.append(ws.send_message(data, action))
+            if ws.is_multiplexed:
+                tagged_text = tagged_text or encode_message(
+                    data, action, game_id=game.id
+                )
+                await ws.send_text(tagged_text)
+            else:
+                await ws.send_text(text)
 
-        await asyncio.gather(*coros)
+        SpectatorConsumer.publish(game.id, text)
 
-    async def error_catcher(self, error):
-        await self.send_message({
-            "type": "Ошибка",
-            "detail": str(error)
-        }, is_success=False)
+    async def send_game_message(
+        self, game_id: UUID, message: dict, action: str | None = None
+    ):
+        await self.send_message(message, action)
+
+    def is_error_debounced(self, error: FloodError) -> bool:
+        """Ключ - текст ошибки: у FloodError он из фиксированного набора,
+        поэтому словарь не растёт от присланных клиентом данных."""
 
-        print_exc()
-        print(f"Произошла ошибка при запросе {self.action}")
+        key = str(error)
+        now = time.monotonic()
+        if now - self.error_times.get(key, -self.ERROR_DEBOUNCE) < self.ERROR_DEBOUNCE:
+            return True
+
+        self.error_times[key] = now
+        return False
+
+    async def error_catcher(self, error):
+        is_debounced = (
+            isinstance(error, FloodError) and self.is_error_debounced(error)
+        )
+
+        if not is_debounced:
+            await self.send_message({
+                "type": "Ошибка",
+                "detail": str(error)
+            }, is_success=False)
+
+        self.log_error(error)
+
+    def log_error(self, error: Exception):
+        """Ожидаемые отказы пишутся без трейсбека, остальное - с ним."""
+
+        context = {"action": self.action, "error": type(error).__name__}
+        if isinstance(error, EXPECTED_ERRORS):
+            logger.info(
+                "Запрос %s отклонён: %s", self.action, str(error),
+                extra={"context": context},
+            )
+        else:
+            logger.error(
+                "Произошла ошибка при запросе %s", self.action,
+                exc_info=error, extra={"context": context},
+            )
 
     async def attempt_register(self) -> bool:
         if self.is_registered:
@@ -133,8 +394,11 @@ class GameConsumer(BaseConsumer):
         if all(key):
             self.get_game_and_player(is_auth_required=False)
 
-            if key in self.connects:
-                raise ValueError('Вы уже подключены')
+            connect = self.connects.get(key)
+            if connect is not None:
+                if not connect.is_stale():
+                    raise ValueError('Вы уже подключены')
+                await connect.reap()
 
             self.connects[key] = self
             self.is_registered = True
@@ -159,16 +423,526 @@ class GameConsumer(BaseConsumer):
         return game, player
 
     async def websocket_connect(self, event):
-        await super().websocket_connect(event)
-
         kwargs = self.scope.get('url_route', {}).get('kwargs', {})
         self.game_id = kwargs.get('game_id')
         self.player_id = kwargs.get('player_id')
+
+        # Неверный ?last_seq не мешает подключиться: клиент получит
+        # ошибку и полную карту
+        last_seq_error = None
+        last_seq = self.get_query_params().get('last_seq')
+        try:
+            self.last_seq = int(last_seq[0]) if last_seq else None
+        except ValueError:
+            last_seq_error = ValueError("last_seq должен быть целым числом")
+
+        if self.player_id is None:
+            # Токен в рукопожатии проверяется до accept, неавторизованное
+            # соединение закрывается, так и не открывшись
+            try:
+                token = self.authenticate_handshake()
+                if token is not None:
+                    self.player_id = token.sub
+                    self.get_game_and_player(is_auth_required=False)
+            except Exception:
+                await self.close_connection(None)
+                return
+
+        await super().websocket_connect(event)
+        if last_seq_error is not None:
+            await self.error_catcher(last_seq_error)
         await self.attempt_register()
 
-    async def websocket_disconnect(self, event):
-        await super().websocket_disconnect(event)
-        self.connects.pop(self.get_game_key(), None)
+    async def on_disconnect(self):
+        await super().on_disconnect()
+
+        key = self.get_game_key()
+        if self.connects.get(key) is self:
+            del self.connects[key]
 
     def get_game_key(self):
         return self.game_id, self.player_id
+
+
+class SpectatorFeed:
+    """Общая лента кадров одной игры для всех её наблюдателей.
+
+    Публикация только добавляет кадр в кольцевой буфер и не зависит от
+    числа наблюдателей: каждый читает ленту сам со своей позиции.
+    Отставший больше чем на SIZE кадров получает снимок заново.
+    Закрытая лента дочитывается до конца, после чего наблюдатели
+    отключаются.
+    """
+
+    SIZE = 64
+
+    def __init__(self):
+        self.frames: deque[str] = deque(maxlen=self.SIZE)
+        # Номер следующего кадра
+        self.head = 0
+        self.changed: asyncio.Future | None = None
+        self.is_waking = False
+        self.is_closed = False
+
+    def publish(self, text: str):
+        self.frames.append(text)
+        self.head += 1
+        self.schedule_wake()
+
+    def close(self):
+        self.is_closed = True
+        self.schedule_wake()
+
+    def schedule_wake(self):
+        if self.changed is not None and not self.is_waking:
+            # Читатели просыпаются отдельным шагом цикла, а не внутри хода
+            self.is_waking = True
+            asyncio.get_running_loop().call_soon(self.wake)
+
+    def wake(self):
+        self.is_waking = False
+        changed, self.changed = self.changed, None
+        if changed is not None and not changed.done():
+            changed.set_result(None)
+
+    def read(self, cursor: int) -> list[str] | None:
+        """Кадры начиная с cursor; None - они уже вытеснены из буфера."""
+
+        start = self.head - len(self.frames)
+        if cursor < start:
+            return None
+        return list(islice(self.frames, cursor - start, None))
+
+    async def wait(self, cursor: int):
+        if cursor < self.head or self.is_closed:
+            return
+
+        if self.changed is None:
+            self.changed = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self.changed)
+
+
+class SpectatorConsumer(GameConsumer):
+    """Наблюдатель за игрой, только чтение.
+
+    Каждое событие кодируется один раз и попадает в общую ленту игры,
+    поэтому ход игрока не ждёт зрителей и не зависит от их числа.
+    Отставший наблюдатель получает свежий снимок не чаще, чем раз
+    в SNAPSHOT_INTERVAL секунд. id игроков наблюдателю не отправляются.
+    """
+
+    spectators: ClassVar[dict[UUID, set["SpectatorConsumer"]]] = {}
+    feeds: ClassVar[dict[UUID, SpectatorFeed]] = {}
+
+    SNAPSHOT_INTERVAL = 1
+
+    def __init__(self):
+        super().__init__()
+        self.last_snapshot_at = 0.0
+        self.writer: asyncio.Task | None = None
+
+    @classmethod
+    def publish(cls, game_id: UUID, text: str):
+        feed = cls.feeds.get(game_id)
+        if feed is not None:
+            feed.publish(text)
+
+    @classmethod
+    def publish_message(cls, game_id: UUID, message: dict, action: str):
+        if game_id in cls.feeds:
+            cls.publish(game_id, encode_message(message, action))
+
+    @classmethod
+    async def broadcast(
+        cls, game_id: UUID, message: dict, action: str, is_final: bool = False
+    ):
+        cls.publish_message(game_id, message, action)
+        if is_final:
+            cls.close_feed(game_id)
+
+    @classmethod
+    def close_feed(cls, game_id: UUID, message: dict | None = None):
+        """Последний кадр ленты: наблюдатели дочитывают её и отключаются."""
+
+        feed = cls.feeds.get(game_id)
+        if feed is None or feed.is_closed:
+            return
+
+        if message is not None:
+            feed.publish(encode_message(message, "game_closed"))
+        feed.close()
+
+    async def send_snapshot(self, feed: SpectatorFeed) -> int:
+        """Отправляет снимок и возвращает позицию ленты, с которой он актуален."""
+
+        from app.logic.game import Game
+
+        loop = asyncio.get_running_loop()
+        delay = self.last_snapshot_at + self.SNAPSHOT_INTERVAL - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        self.last_snapshot_at = loop.time()
+        cursor = feed.head
+        game = Game.get_game_by_id(self.game_id)
+        await self.send_message(game.get_public_snapshot(), "syncronize")
+        return cursor
+
+    async def write_loop(self, feed: SpectatorFeed):
+        try:
+            await self.stream(feed)
+        except ValueError as e:
+            # Игру сняли с учёта, пока наблюдатель ждал снимка
+            await self.error_catcher(e)
+        except Exception:
+            logger.exception("Spectator feed of game %s failed", self.game_id)
+
+        if self.is_connected:
+            self.is_connected = False
+            await self.close_connection(None)
+
+    async def stream(self, feed: SpectatorFeed):
+        """Пишет ленту наблюдателю, пока она не закрыта и не дочитана."""
+
+        cursor = None
+        while True:
+            if cursor is None:
+                cursor = await self.send_snapshot(feed)
+                continue
+
+            await feed.wait(cursor)
+            frames = feed.read(cursor)
+            if frames is None:
+                cursor = None
+                continue
+
+            cursor += len(frames)
+            for text in frames:
+                await self.send_text(text)
+
+            if feed.is_closed and cursor >= feed.head:
+                return
+
+    async def receive(self, data: dict):
+        if data.get('action') not in ("ping", "pong"):
+            raise ValueError("Наблюдатель не может совершать действия")
+
+        await super().receive(data)
+
+    async def websocket_connect(self, event):
+        from app.logic.game import Game
+
+        kwargs = self.scope.get('url_route', {}).get('kwargs', {})
+        self.game_id = kwargs.get('game_id')
+        game = Game.games.get(self.game_id)
+        if game is None:
+            await self.close_connection(None)
+            return
+
+        await BaseConsumer.websocket_connect(self, event)
+
+        self.spectators.setdefault(self.game_id, set()).add(self)
+        feed = self.feeds.setdefault(self.game_id, SpectatorFeed())
+        if game.is_end:
+            # Пришедший после конца получает итоговый снимок и отключается
+            feed.close()
+        self.writer = asyncio.create_task(self.write_loop(feed))
+
+    async def on_disconnect(self):
+        await BaseConsumer.on_disconnect(self)
+
+        spectators = self.spectators.get(self.game_id)
+        if spectators is not None:
+            spectators.discard(self)
+            if not spectators:
+                del self.spectators[self.game_id]
+                self.feeds.pop(self.game_id, None)
+
+        if self.writer is not None:
+            self.writer.cancel()
+
+
+class MultiplexConsumer(GameConsumer):
+    """Одно соединение игрока на много игр.
+
+    Игрок авторизуется токеном и подписывается на игры по game_id.
+    Соединение записано в connects под каждой своей парой (игра, игрок),
+    входящие и исходящие кадры несут game_id.
+    """
+
+    is_multiplexed = True
+
+    def __init__(self):
+        super().__init__()
+        self.subscriptions: set[UUID] = set()
+
+    async def receive(self, data: dict):
+        payload = data.get('data')
+        game_id = payload.get('game_id') if isinstance(payload, dict) else None
+        self.game_id = UUID(str(game_id)) if game_id else None
+        await super().receive(data)
+
+    async def handle_auth(self, data: dict):
+        if self.player_id is not None:
+            raise ValueError("Вы уже авторизованы")
+
+        token = validate_token(data.get('token'))
+        self.player_id = token.sub
+        await self.send_message({"player_id": self.player_id})
+
+    async def handle_subscribe(self, data: dict):
+        if self.player_id is None:
+            raise ValueError("Не авторизован")
+
+        if self.game_id in self.subscriptions:
+            raise ValueError("Вы уже подписаны")
+
+        key = self.get_game_key()
+        _, player = self.get_game_and_player(is_auth_required=False)
+
+        connect = self.connects.get(key)
+        if connect is not None:
+            if not connect.is_stale():
+                raise ValueError('Вы уже подключены')
+            await connect.reap()
+
+        last_seq = data.get('last_seq')
+        if last_seq is not None and (
+            isinstance(last_seq, bool) or not isinstance(last_seq, int)
+        ):
+            raise ValueError("last_seq должен быть целым числом")
+
+        self.connects[key] = self
+        self.subscriptions.add(self.game_id)
+        await player.on_connect(last_seq)
+
+    async def handle_unsubscribe(self, data: dict):
+        self.unsubscribe(self.game_id)
+        await self.send_message({})
+
+    def unsubscribe(self, game_id: UUID):
+        self.subscriptions.discard(game_id)
+
+        key = (game_id, self.player_id)
+        if self.connects.get(key) is self:
+            del self.connects[key]
+
+    def get_game_and_player(
+        self, is_auth_required: bool = True
+    ) -> tuple["Game", "Player"]:
+        if is_auth_required and self.game_id not in self.subscriptions:
+            raise ValueError("Не подписан на игру")
+
+        return super().get_game_and_player(is_auth_required=False)
+
+    async def send_message(
+        self,
+        message: dict | str,
+        action: str | None = None,
+        is_success: bool = True
+    ):
+        await self.send_text(encode_message(
+            message, action or self.action, is_success, self.game_id
+        ))
+
+    async def send_game_message(
+        self, game_id: UUID, message: dict, action: str | None = None
+    ):
+        await self.send_text(encode_message(
+            message, action or self.action, game_id=game_id
+        ))
+
+    async def websocket_connect(self, event):
+        try:
+            token = self.authenticate_handshake()
+        except Exception:
+            await self.close_connection(None)
+            return
+
+        if token is not None:
+            self.player_id = token.sub
+
+        await BaseConsumer.websocket_connect(self, event)
+
+    async def on_disconnect(self):
+        await BaseConsumer.on_disconnect(self)
+
+        for game_id in list(self.subscriptions):
+            self.unsubscribe(game_id)
+
+
+class DashboardConsumer(GameConsumer):
+    """Сводка по всем играм, подходящим под фильтр.
+
+    После подписки приходит полный список подходящих игр, затем
+    пакетные изменения от DashboardHub. В сводке id игроков, по которым
+    можно занять чужое место, поэтому вход - только по ключу платформы,
+    токена игрока мало.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.is_authenticated = False
+        self.filter: "DashboardFilter | None" = None
+        self.visible: set[UUID] = set()
+
+    async def handle_auth(self, data: dict):
+        token = data.get('token') if isinstance(data, dict) else None
+        if not isinstance(token, str):
+            raise ValueError("Нужен ключ платформы")
+        validate_api_key(token.removeprefix("Bearer "))
+        self.is_authenticated = True
+        await self.send_message({})
+
+    async def handle_subscribe(self, data: dict | None):
+        if not self.is_authenticated:
+            raise ValueError("Не авторизован")
+
+        from app.logic.dashboard import DashboardFilter, DashboardHub, get_state
+        from app.logic.game import Game
+
+        self.filter = DashboardFilter.from_dict(data)
+        games = [
+            game for game in list(Game.games.values())
+            if self.filter.matches(game)
+        ]
+        self.visible = {game.id for game in games}
+        DashboardHub.instance().dashboards.add(self)
+
+        await self.send_message(
+            {"games": [get_state(game) for game in games]}
+        )
+
+    async def websocket_connect(self, event):
+        key = self.get_handshake_token()
+        if key is not None:
+            try:
+                validate_api_key(key)
+            except Exception:
+                await self.close_connection(None)
+                return
+            self.is_authenticated = True
+
+        await BaseConsumer.websocket_connect(self, event)
+
+    async def on_disconnect(self):
+        await BaseConsumer.on_disconnect(self)
+
+        from app.logic.dashboard import DashboardHub
+
+        DashboardHub.instance().dashboards.discard(self)
+
+
+class MatchmakingConsumer(BaseConsumer):
+    def __init__(self):
+        super().__init__()
+        self.ticket: "Ticket | None" = None
+
+    async def handle_join(self, data: dict | None):
+        if self.ticket is not None and self.ticket.is_active:
+            raise ValueError("Вы уже в очереди")
+
+        from app.logic.matchmaking import Matchmaker, Ticket
+
+        data = data or {}
+        matchmaker = Matchmaker.instance()
+        ticket = Ticket(
+            consumer=self,
+            rating=data.get('rating'),
+            symbol=data.get('symbol'),
+        )
+        matchmaker.enqueue(ticket)
+        self.ticket = ticket
+        await self.send_message({"queue_size": matchmaker.size})
+
+    async def handle_leave(self, data: dict | None):
+        self.leave_queue()
+        await self.send_message({})
+
+    async def on_matched(self, game: "Game", player: "Player"):
+        self.ticket = None
+        await self.send_message({
+            "game_id": game.id,
+            "player_id": player.id,
+            "symbol": player.symbol,
+        }, "matched")
+
+    def leave_queue(self):
+        if self.ticket is None:
+            return
+
+        from app.logic.matchmaking import Matchmaker
+
+        Matchmaker.instance().cancel(self.ticket)
+        self.ticket = None
+
+    async def error_catcher(self, error):
+        await self.send_message({
+            "type": "Ошибка",
+            "detail": str(error)
+        }, is_success=False)
+
+    async def on_disconnect(self):
+        await super().on_disconnect()
+        self.leave_queue()
+
+
+class TournamentConsumer(BaseConsumer):
+    """Уведомления турнира: о новых турах и об окончании.
+
+    Участник (маршрут с player_id) получает свою партию тура,
+    наблюдатель - только номер тура и число партий.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tournament_id: UUID | None = None
+        self.player_id: UUID | None = None
+
+    async def receive(self, data: dict):
+        if data.get('action') not in ("ping", "pong"):
+            raise ValueError("Неизвестное действие")
+
+        await super().receive(data)
+
+    async def error_catcher(self, error):
+        await self.send_message({
+            "type": "Ошибка",
+            "detail": str(error)
+        }, is_success=False)
+
+    async def websocket_connect(self, event):
+        from app.logic.tournament import TournamentHub
+
+        kwargs = self.scope.get('url_route', {}).get('kwargs', {})
+        self.tournament_id = kwargs.get('tournament_id')
+        self.player_id = kwargs.get('player_id')
+
+        await super().websocket_connect(event)
+
+        # Ошибка уходит клиенту кадром, а не обрывает рукопожатие
+        hub = TournamentHub.instance()
+        try:
+            tournament = hub.get_tournament(self.tournament_id)
+            if self.player_id is not None and self.player_id not in tournament.participants:
+                raise ValueError("Игрок не участвует в турнире")
+        except ValueError as e:
+            await self.error_catcher(e)
+            self.is_connected = False
+            await self.close_connection(None)
+            return
+
+        hub.subscribe(self)
+
+        if self.player_id is not None:
+            message = tournament.get_player_notice(self.player_id)
+        else:
+            message = tournament.get_state(limit=hub.NOTICE_STANDINGS)
+        await self.send_message(message, "tournament")
+
+    async def on_disconnect(self):
+        await super().on_disconnect()
+
+        from app.logic.tournament import TournamentHub
+
+        TournamentHub.instance().unsubscribe(self)
@@ -1,2 +1,2 @@
-from .api import quit_player, add_results
+from .api import quit_player, add_results, send_events, join
 from .meta import meta_dict
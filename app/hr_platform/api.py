@@ -1,63 +1,184 @@
+import asyncio
 import json
-from typing import TYPE_CHECKING
+import logging
+from collections import defaultdict, deque
+from uuid import UUID
 
 import httpx
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
 
 from app.logic.enums import WinStatus
-
-if TYPE_CHECKING:
-    from app.logic.player import Player
-    from app.logic.game import Game
+from app.logic.events import GameEnded, GameEvent, PlayerQuit
 
 default_headers = {
     "Authorization": f"Bearer {settings.EXTERNAL_API_KEY}",
     "Content-Type": "application/json",
 }
 
+# Подменяется симулятором платформы в бенчмарках
+transport: httpx.AsyncBaseTransport | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=transport)
+
 
 def decode_data(data: dict):
     return json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)
 
 
-async def quit_player(player: "Player"):
-    async with httpx.AsyncClient() as httpx_client:
+# Повторы отправки недолговечного события и пауза перед первым из них.
+# Долговечные (результаты, выход игрока) повторяются, пока платформа не
+# ответит, с паузой не больше MAX_RETRY_DELAY
+RETRIES = 3
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 60
+
+# Игры, чьи события ждут повтора: новые события игры встают за ними
+retrying: dict[UUID, deque[GameEvent]] = {}
+retry_tasks: set[asyncio.Task] = set()
+
+
+async def quit_player(game_id: UUID, player_id: UUID):
+    async with get_client() as httpx_client:
         response = await httpx_client.post(
-            f"{settings.EXTERNAL_API_URL}/assessment/{player.game_id}/quit",
-            content=decode_data({"uid": player.id}),
+            f"{settings.EXTERNAL_API_URL}/assessment/{game_id}/quit",
+            content=decode_data({"uid": player_id}),
             headers=default_headers,
         )
         response.raise_for_status()
 
 
-async def add_results(game: "Game"):
-    async with httpx.AsyncClient() as httpx_client:
+async def add_results(event: GameEnded):
+    async with get_client() as httpx_client:
         response = await httpx_client.post(
-            f"{settings.EXTERNAL_API_URL}/assessment/{game.id}/add",
-            content=decode_data(get_results(game)),
+            f"{settings.EXTERNAL_API_URL}/assessment/{event.game_id}/add",
+            content=decode_data(get_results(event)),
             headers=default_headers
         )
         response.raise_for_status()
 
 
-def get_results(game: "Game"):
-    win_status_positions = {
-        WinStatus.WIN: 1,
-        WinStatus.DRAW: 2,
-        WinStatus.LOSE: 2,
-        WinStatus.UNKNOWN: 3,
-    }
+async def send_event(event: GameEvent):
+    if isinstance(event, PlayerQuit):
+        await quit_player(event.game_id, event.player_id)
+    elif isinstance(event, GameEnded):
+        await add_results(event)
+
+
+def log_failure(event: GameEvent):
+    logging.exception(
+        "Failed to send %s for game %s", type(event).__name__, event.game_id
+    )
+
+
+def get_retry_delay(attempt: int) -> float:
+    return min(RETRY_DELAY * 2 ** min(attempt - 1, 16), MAX_RETRY_DELAY)
+
+
+def is_retryable(error: httpx.HTTPError) -> bool:
+    # Ошибку в самом запросе (4xx) повтор не исправит
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+async def retry_game_events(game_id: UUID):
+    """Досылает события игры после сбоя, по порядку и с паузами.
+
+    Идёт в своей задаче, поэтому пачка шины и другие игры её не ждут.
+    Долговечное событие отбрасывается только при отказе по самому
+    запросу (4xx), временные сбои повторяются без ограничения.
+    """
+
+    backlog = retrying[game_id]
+    attempt = 1
+    try:
+        while backlog:
+            if attempt:
+                await asyncio.sleep(get_retry_delay(attempt))
+
+            event = backlog[0]
+            try:
+                await send_event(event)
+            except httpx.HTTPError as e:
+                if is_retryable(e) and (event.is_durable or attempt < RETRIES):
+                    if attempt == RETRIES:
+                        logging.warning(
+                            "Platform is unavailable, still retrying %s for game %s: %s",
+                            type(event).__name__, event.game_id, e,
+                        )
+                    attempt += 1
+                    continue
+                log_failure(event)
+
+            backlog.popleft()
+            attempt = 0
+    finally:
+        del retrying[game_id]
+
+
+def schedule_retry(game_id: UUID, events: list[GameEvent]):
+    retrying[game_id] = deque(events)
+    task = asyncio.get_running_loop().create_task(retry_game_events(game_id))
+    retry_tasks.add(task)
+    task.add_done_callback(retry_tasks.discard)
+
+
+async def join():
+    """Ждёт, пока отработают все повторы."""
+
+    while retry_tasks:
+        await asyncio.gather(*retry_tasks, return_exceptions=True)
+
+
+async def send_events(events: list[GameEvent]):
+    """Обработчик шины событий для внешних игр.
+
+    События одной игры отправляются по порядку, разных игр - параллельно.
+    Каждое пробуется один раз; после временного сбоя оставшиеся события
+    игры уходят на повтор в фоне, не задерживая пачку.
+    """
+
+    by_game: dict[UUID, list[GameEvent]] = defaultdict(list)
+    for event in events:
+        if not event.is_external_created:
+            continue
+
+        backlog = retrying.get(event.game_id)
+        if backlog is not None:
+            backlog.append(event)
+        else:
+            by_game[event.game_id].append(event)
+
+    async def send_game_events(game_id: UUID, game_events: list[GameEvent]):
+        for number, event in enumerate(game_events):
+            try:
+                await send_event(event)
+            except httpx.HTTPError as e:
+                if is_retryable(e):
+                    schedule_retry(game_id, game_events[number:])
+                    return
+                log_failure(event)
+
+    await asyncio.gather(*(
+        send_game_events(game_id, game_events)
+        for game_id, game_events in by_game.items()
+    ))
+
+
+def get_results(event: GameEnded):
     return {
         "players": [
             {
                 "uid": player.id,
-                "position": win_status_positions[player.storage.win_status],
+                "position": player.position,
                 "results": {
-                    "win": player.storage.win_status == WinStatus.WIN,
-                    "draw": player.storage.win_status == WinStatus.DRAW,
+                    "win": player.win_status == WinStatus.WIN,
+                    "draw": player.win_status == WinStatus.DRAW,
                 },
             }
-            for player in game.players
+            for player in event.players
         ]
     }
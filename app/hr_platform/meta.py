@@ -45,9 +45,88 @@ meta_dict = MetaModel(
                     ),
                     default="O"
                 ),
+                IdString("symbol_player_3"): ParamString(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Символ игрока 3",
+                        en="Player 3 symbol"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="Символ, которым играет игрок 3",
+                        en="Symbol that player 3 plays with"
+                    ),
+                    default="Y"
+                ),
+                IdString("symbol_player_4"): ParamString(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Символ игрока 4",
+                        en="Player 4 symbol"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="Символ, которым играет игрок 4",
+                        en="Symbol that player 4 plays with"
+                    ),
+                    default="Z"
+                ),
+                IdString("board_size"): ParamInteger(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Размер поля",
+                        en="Board size"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="Сторона классического поля. 0 - на единицу больше числа игроков",
+                        en="Side of the classic board. 0 means one more than the number of players"
+                    ),
+                    default=0,
+                    format=Format.int32,
+                    min=0,
+                    max=10,
+                ),
+                IdString("variant"): ParamString(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Вариант игры",
+                        en="Game variant"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="classic - поле 3x3, ultimate - 3x3 малых полей, ход определяет поле соперника",
+                        en="classic is a 3x3 board, ultimate is a 3x3 grid of boards where a move picks the opponent's board"
+                    ),
+                    default="classic"
+                ),
+                IdString("turn_time_limit"): ParamInteger(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Время на ход",
+                        en="Turn time limit"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="Секунд на ход, после чего игроку засчитывается поражение. 0 - без ограничения",
+                        en="Seconds per turn before the player forfeits. 0 means no limit"
+                    ),
+                    default=0,
+                    format=Format.int32,
+                    min=0,
+                ),
+                IdString("game_time_limit"): ParamInteger(
+                    required=False,
+                    title=LocalizedStr255(
+                        ru="Время на игру",
+                        en="Game time limit"
+                    ),
+                    desc=LocalizedStr1024(
+                        ru="Секунд на всю игру, после чего она завершается ничьей. 0 - без ограничения",
+                        en="Seconds per game before it ends in a draw. 0 means no limit"
+                    ),
+                    default=0,
+                    format=Format.int32,
+                    min=0,
+                ),
             },
             min_players=2,
-            max_players=2,
+            max_players=4,
             supported=True,
             results={
                 "win": Result(
@@ -90,6 +169,30 @@ meta_dict = MetaModel(
                     min_players=1,
                     max_players=1,
                 ),
+                RoleMultiKey("player_3"): RoleMulti(
+                    title=LocalizedStr255(
+                        ru="Игрок 3",
+                        en="Player 3"
+                    ),
+                    description=LocalizedStr1024(
+                        ru="Игрок 3",
+                        en="Player 3"
+                    ),
+                    min_players=0,
+                    max_players=1,
+                ),
+                RoleMultiKey("player_4"): RoleMulti(
+                    title=LocalizedStr255(
+                        ru="Игрок 4",
+                        en="Player 4"
+                    ),
+                    description=LocalizedStr1024(
+                        ru="Игрок 4",
+                        en="Player 4"
+                    ),
+                    min_players=0,
+                    max_players=1,
+                ),
             },
         )
     )
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import random
+import re
+import time
+from uuid import UUID
+
+import httpx
+
+PATH_RE = re.compile(r"/assessment/(?P<assessment_id>[0-9a-f-]+)/(?P<action>add|quit)$")
+
+
+class PlatformSimulator(httpx.AsyncBaseTransport):
+    """Локальная замена HR-платформы для api.transport.
+
+    Отвечает на /assessment/{id}/add и /quit с заданной задержкой и долей
+    отказов и запоминает, что и когда пришло.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+        self.results: dict[UUID, tuple[float, dict]] = {}
+        self.quits: dict[UUID, list[dict]] = {}
+        self.requests = 0
+        self.failures = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        match = PATH_RE.search(request.url.path)
+        if match is None or request.method != "POST":
+            return httpx.Response(404)
+
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            return httpx.Response(503)
+
+        assessment_id = UUID(match["assessment_id"])
+        body = json.loads(await request.aread() or b"{}")
+
+        if match["action"] == "add":
+            self.results[assessment_id] = (time.monotonic(), body)
+        else:
+            self.quits.setdefault(assessment_id, []).append(body)
+
+        return httpx.Response(200, json={})
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+Command = Callable[[], Awaitable[Any]]
+
+
+class GameActor:
+    """Очередь команд одной игры с единственным исполнителем.
+
+    Команды выполняются строго по одной в порядке поступления. Всё, что
+    накопилось за время выполнения, забирается пачкой, а отправки игрокам,
+    сделанные командами пачки, уходят вместе после неё в исходном порядке.
+    """
+
+    # Игр в памяти много, а команды приходят не во все, поэтому очередь
+    # создаётся при первой команде
+    __slots__ = ("_commands", "_task", "_sends")
+
+    def __init__(self):
+        self._commands: deque[tuple[Command, asyncio.Future]] | None = None
+        self._task: asyncio.Task | None = None
+        self._sends: list[Awaitable] | None = None
+
+    def submit(self, command: Command) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._commands is None:
+            self._commands = deque()
+        self._commands.append((command, future))
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._drain())
+
+        return future
+
+    async def deliver(self, send: Awaitable):
+        """Откладывает отправку до конца пачки, если пачка выполняется."""
+
+        if self._sends is None:
+            await send
+            return
+
+        self._sends.append(send)
+
+    async def _drain(self):
+        batch = []
+        try:
+            while self._commands:
+                batch = list(self._commands)
+                self._commands.clear()
+
+                self._sends = []
+                try:
+                    for command, future in batch:
+                        try:
+                            result = await command()
+                        except Exception as ex:
+                            if not future.cancelled():
+                                future.set_exception(ex)
+                        else:
+                            if not future.cancelled():
+                                future.set_result(result)
+                finally:
+                    sends, self._sends = self._sends, None
+
+                # По очереди, чтобы кадры уходили в том порядке, в каком
+                # их отправили команды
+                for send in sends:
+                    try:
+                        await send
+                    except Exception:
+                        logging.exception("Deferred send failed")
+        finally:
+            # Исполнитель снят (отмена или BaseException) - ждущие команды
+            # не должны висеть вечно
+            pending = [*batch, *(self._commands or ())]
+            if self._commands:
+                self._commands.clear()
+
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("Команда игры не выполнена")
+                    )
@@ -0,0 +1,143 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.logic.events import GameEnded
+
+
+class ResultsArchive:
+    """Архив завершённых игр: по строке NDJSON на игру.
+
+    Живые игры удаляются из памяти после ENDED_GAME_TTL, поэтому выгрузка
+    читает архив построчно и не держит в памяти больше одного чанка.
+    Чтение и фильтр идут в потоке, чтобы не занимать цикл событий.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    # Сколько архива просмотреть за раз, даже если совпадений мало
+    SCAN_SIZE = 1024 * 1024
+    __instance = None
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def append(self, events: list[GameEnded]):
+        """Обработчик шины событий: пачка игр - одна запись в файл."""
+
+        self._file.write("".join(
+            json.dumps(
+                self.serialize(event), ensure_ascii=False, cls=DjangoJSONEncoder
+            ) + "\n"
+            for event in events
+        ))
+
+    @staticmethod
+    def serialize(event: GameEnded) -> dict:
+        return {
+            "game_id": event.game_id,
+            "ended_at": event.at,
+            "is_external_created": event.is_external_created,
+            "players": [
+                {
+                    "id": player.id,
+                    "name": player.name,
+                    "symbol": player.symbol,
+                    "win_status": player.win_status,
+                    "position": player.position,
+                }
+                for player in event.players
+            ],
+            "map": event.map,
+        }
+
+    async def stream(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        is_external_created: bool | None = None,
+    ) -> AsyncIterator[str]:
+        try:
+            file = await asyncio.to_thread(open, self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        with file:
+            while True:
+                chunk = await asyncio.to_thread(
+                    self.read_chunk, file, since, until, is_external_created
+                )
+                if chunk is None:
+                    return
+                if chunk:
+                    yield chunk
+
+    def read_chunk(
+        self,
+        file,
+        since: datetime | None,
+        until: datetime | None,
+        is_external_created: bool | None,
+    ) -> str | None:
+        """Следующий чанк подходящих строк, None - архив кончился.
+
+        Отдаёт накопленное по CHUNK_SIZE совпадений или по SCAN_SIZE
+        просмотренного, так что редкий фильтр не задерживает ответ.
+        """
+
+        is_filtered = (
+            since is not None or until is not None
+            or is_external_created is not None
+        )
+
+        chunk = []
+        chunk_size = 0
+        scanned = 0
+        for line in file:
+            scanned += len(line)
+            if not is_filtered or self.matches(
+                json.loads(line), since, until, is_external_created
+            ):
+                chunk.append(line)
+                chunk_size += len(line)
+
+            if chunk_size >= self.CHUNK_SIZE or scanned >= self.SCAN_SIZE:
+                return "".join(chunk)
+
+        return "".join(chunk) if chunk else None
+
+    @staticmethod
+    def matches(
+        record: dict,
+        since: datetime | None,
+        until: datetime | None,
+        is_external_created: bool | None,
+    ) -> bool:
+        if (
+            is_external_created is not None
+            and record["is_external_created"] != is_external_created
+        ):
+            return False
+
+        ended_at = datetime.fromisoformat(record["ended_at"])
+        if since is not None and ended_at < since:
+            return False
+        if until is not None and ended_at >= until:
+            return False
+
+        return True
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = ResultsArchive(settings.RESULTS_ARCHIVE_PATH)
+
+        return cls.__instance
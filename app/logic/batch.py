@@ -0,0 +1,115 @@
+"""Пакетная оценка досок 3x3 и массовая самоигра на numpy.
+
+Доска кодируется строкой int8 из 9 клеток: 0 - пусто, 1 и 2 - игроки.
+"""
+from collections.abc import Callable
+from uuid import uuid4
+
+import numpy as np
+
+from app.logic.enums import WinStatus
+from app.logic.storages import GameStorage
+
+EMPTY = 0
+SYMBOLS = ("X", "O")
+
+IN_PROGRESS = 0
+DRAW = 3
+
+LINES = np.array([
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],
+    [0, 4, 8], [2, 4, 6],
+], dtype=np.intp)
+
+Policy = Callable[[np.ndarray, np.ndarray, np.random.Generator], np.ndarray]
+
+
+def evaluate(boards: np.ndarray) -> np.ndarray:
+    """Возвращает статус каждой доски.
+
+    0 - игра идёт, 1 или 2 - победил этот игрок, 3 - ничья.
+    """
+
+    lines = boards[:, LINES]
+    is_full_line = (lines == lines[:, :, :1]).all(axis=2) & (lines[:, :, 0] != EMPTY)
+
+    line_index = is_full_line.argmax(axis=1)
+    winner = lines[np.arange(len(boards)), line_index, 0]
+
+    status = np.where(is_full_line.any(axis=1), winner, IN_PROGRESS)
+    is_draw = (status == IN_PROGRESS) & (boards != EMPTY).all(axis=1)
+    return np.where(is_draw, DRAW, status).astype(np.int8)
+
+
+def random_policy(
+    boards: np.ndarray, players: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    scores = rng.random(boards.shape)
+    scores[boards != EMPTY] = -1
+    return scores.argmax(axis=1)
+
+
+def simulate(
+    games: int,
+    policy: Policy = random_policy,
+    seed: int | None = None,
+    max_moves: int = 9,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Играет games партий одновременно, ход за ходом по всем доскам.
+
+    Возвращает доски после max_moves ходов (или конца партии) и их статусы.
+    """
+
+    rng = np.random.default_rng(seed)
+    boards = np.zeros((games, 9), dtype=np.int8)
+    players = rng.integers(1, 3, size=games, dtype=np.int8)
+    status = np.zeros(games, dtype=np.int8)
+
+    for _ in range(max_moves):
+        active = np.flatnonzero(status == IN_PROGRESS)
+        if not len(active):
+            break
+
+        cells = policy(boards[active], players[active], rng)
+        if (boards[active, cells] != EMPTY).any():
+            raise ValueError("Координата занята")
+
+        boards[active, cells] = players[active]
+        status[active] = evaluate(boards[active])
+        players[active] = 3 - players[active]
+
+    return boards, status
+
+
+def to_map(board: np.ndarray) -> list[str | None]:
+    return [SYMBOLS[cell - 1] if cell else None for cell in board.tolist()]
+
+
+def cross_check(boards: np.ndarray, status: np.ndarray | None = None) -> int:
+    """Сверяет статусы с Game.check_map_winner, возвращает число расхождений."""
+
+    from app.logic.game import Game
+
+    if status is None:
+        status = evaluate(boards)
+
+    expected = {
+        IN_PROGRESS: WinStatus.UNKNOWN,
+        1: WinStatus.WIN,
+        2: WinStatus.WIN,
+        DRAW: WinStatus.DRAW,
+    }
+
+    mismatches = 0
+    for board, board_status in zip(boards, status.tolist()):
+        game = Game(GameStorage(
+            id=uuid4(),
+            players=[],
+            current_player_id=None,
+            map=to_map(board),
+        ))
+        if game.check_map_winner() != expected[board_status]:
+            mismatches += 1
+
+    return mismatches
@@ -0,0 +1,135 @@
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from app.logic.enums import GameStatus, WinStatus
+from app.logic.timers import TimerScheduler
+
+if TYPE_CHECKING:
+    from app.consumers import DashboardConsumer
+    from app.logic.game import Game
+
+
+@dataclass
+class DashboardFilter:
+    status: GameStatus | None = None
+    turn: UUID | None = None
+    winner: UUID | None = None
+    is_external_created: bool | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "DashboardFilter":
+        data = data or {}
+        return cls(
+            status=GameStatus(data["status"]) if data.get("status") else None,
+            turn=UUID(data["turn"]) if data.get("turn") else None,
+            winner=UUID(data["winner"]) if data.get("winner") else None,
+            is_external_created=data.get("is_external_created"),
+        )
+
+    def matches(self, game: "Game") -> bool:
+        if self.status is not None and game.status != self.status:
+            return False
+
+        if self.turn is not None and (
+            game.is_end or game.storage.current_player_id != self.turn
+        ):
+            return False
+
+        if self.winner is not None and not any(
+            player.id == self.winner
+            and player.storage.win_status == WinStatus.WIN
+            for player in game.players
+        ):
+            return False
+
+        if (
+            self.is_external_created is not None
+            and game.storage.is_external_created != self.is_external_created
+        ):
+            return False
+
+        return True
+
+
+class DashboardHub:
+    """Собирает изменения игр и раз в FLUSH_INTERVAL рассылает их дашбордам.
+
+    Сколько бы ходов ни случилось между сбросами, каждый дашборд получает
+    не больше одного кадра за интервал.
+    """
+
+    FLUSH_INTERVAL = 0.1
+    __instance = None
+
+    def __init__(self):
+        self.dashboards: set["DashboardConsumer"] = set()
+        self._dirty: set[UUID] = set()
+        self._is_flush_scheduled = False
+
+    def mark_changed(self, game_id: UUID):
+        if not self.dashboards:
+            return
+
+        self._dirty.add(game_id)
+        if not self._is_flush_scheduled:
+            self._is_flush_scheduled = True
+            TimerScheduler.instance().schedule(self.FLUSH_INTERVAL, self.flush)
+
+    async def flush(self):
+        from app.logic.game import Game
+
+        self._is_flush_scheduled = False
+        dirty, self._dirty = self._dirty, set()
+
+        games = [(game_id, Game.games.get(game_id)) for game_id in dirty]
+        states = {
+            game_id: get_state(game)
+            for game_id, game in games if game is not None
+        }
+
+        coros = []
+        for dashboard in list(self.dashboards):
+            updated = []
+            removed = []
+            for game_id, game in games:
+                if game is not None and dashboard.filter.matches(game):
+                    dashboard.visible.add(game_id)
+                    updated.append(states[game_id])
+                elif game_id in dashboard.visible:
+                    dashboard.visible.discard(game_id)
+                    removed.append(game_id)
+
+            if updated or removed:
+                coros.append(dashboard.send_message(
+                    {"updated": updated, "removed": removed}, "diff"
+                ))
+
+        await asyncio.gather(*coros, return_exceptions=True)
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = DashboardHub()
+
+        return cls.__instance
+
+
+def get_state(game: "Game") -> dict:
+    return {
+        "game_id": game.id,
+        "status": game.status,
+        "current_player_id": game.storage.current_player_id,
+        "is_external_created": game.storage.is_external_created,
+        "seq": game.storage.seq,
+        "variant": game.storage.variant,
+        "next_board": game.next_board,
+        "map": game.map,
+        "players": [
+            {"id": player.id, "win_status": player.storage.win_status}
+            for player in game.players
+        ],
+    }
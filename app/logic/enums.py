@@ -7,3 +7,22 @@ class WinStatus(StrEnum):
     LOSE = "lose"
     DRAW = "draw"
     UNKNOWN = "unknown"
+
+
+class GameStatus(StrEnum):
+    """GameStatus enumeration."""
+    WAITING = "waiting"
+    PLAYING = "playing"
+    ENDED = "ended"
+
+
+class GameVariant(StrEnum):
+    """GameVariant enumeration."""
+    CLASSIC = "classic"
+    ULTIMATE = "ultimate"
+
+
+class TournamentFormat(StrEnum):
+    """TournamentFormat enumeration."""
+    SWISS = "swiss"
+    BRACKET = "bracket"
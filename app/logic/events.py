@@ -0,0 +1,238 @@
+import asyncio
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, ClassVar
+from uuid import UUID
+
+from app.logic.enums import WinStatus
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class GameEvent:
+    # Долговечные события не отбрасываются ни при каком переполнении
+    is_durable: ClassVar[bool] = False
+
+    game_id: UUID
+    at: datetime = field(default_factory=now)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class GameCreated(GameEvent):
+    player_ids: tuple[UUID, ...]
+    variant: str
+    is_external_created: bool
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class MoveMade(GameEvent):
+    seq: int
+    player_id: UUID
+    coordinate: int
+    symbol: str
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class TurnStarted(GameEvent):
+    player_id: UUID
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PlayerQuit(GameEvent):
+    is_durable: ClassVar[bool] = True
+
+    player_id: UUID
+    is_external_created: bool
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerResult:
+    id: UUID
+    name: str
+    symbol: str
+    win_status: WinStatus
+    position: int
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class GameEnded(GameEvent):
+    is_durable: ClassVar[bool] = True
+
+    players: tuple[PlayerResult, ...]
+    map: tuple[str | None, ...]
+    is_external_created: bool
+    is_rated: bool
+
+
+Handler = Callable[[list[GameEvent]], Awaitable[Any] | Any]
+
+
+class Sink:
+    """Подписчик шины со своей очередью.
+
+    События отдаются обработчику пачками до BATCH_SIZE. Пока обработчик
+    занят, новые копятся в очереди. Сверх queue_size отбрасываются только
+    недолговечные события, долговечные встают в очередь всегда.
+    Исключение обработчика пишется в журнал и дальше не уходит.
+
+    join - ожидание фоновой работы обработчика, например повторов
+    отправки, которую обработчик увёл из пачки.
+    """
+
+    QUEUE_SIZE = 1024
+    BATCH_SIZE = 64
+
+    def __init__(
+        self,
+        name: str,
+        handler: Handler,
+        event_types: tuple[type[GameEvent], ...] = (GameEvent,),
+        queue_size: int | None = None,
+        batch_size: int | None = None,
+        join: Callable[[], Awaitable[Any]] | None = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.event_types = event_types
+        self.queue_size = queue_size or self.QUEUE_SIZE
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self._join = join
+
+        self.handled = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._queue: asyncio.Queue[GameEvent] | None = None
+        self._task: asyncio.Task | None = None
+
+    def offer(self, event: GameEvent):
+        if not isinstance(event, self.event_types):
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+
+        if not event.is_durable and self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            logging.warning(
+                "Event sink %s is full, dropped %s for game %s",
+                self.name, type(event).__name__, event.game_id,
+            )
+            return
+
+        self._queue.put_nowait(event)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self):
+        queue = self._queue
+        while not queue.empty():
+            batch = [queue.get_nowait()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                result = self.handler(batch)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                self.failed += len(batch)
+                logging.exception("Event sink %s failed", self.name)
+            else:
+                self.handled += len(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def join(self):
+        if self._queue is not None:
+            await self._queue.join()
+        if self._join is not None:
+            await self._join()
+
+    def reset(self):
+        self._queue = None
+        self._task = None
+
+
+class EventBus:
+    """Шина событий игр внутри процесса.
+
+    publish только раскладывает событие по очередям подписчиков и
+    никогда не ждёт их обработки. Вызов из другого потока передаётся
+    в цикл событий; до появления цикла события копятся в буфере,
+    недолговечные - не больше PENDING_SIZE.
+    """
+
+    PENDING_SIZE = 1024
+    __instance = None
+
+    def __init__(self):
+        self.sinks: list[Sink] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: deque[GameEvent] = deque()
+
+    def subscribe(self, sink: Sink) -> Sink:
+        self.sinks.append(sink)
+        return sink
+
+    def unsubscribe(self, sink: Sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        for sink in self.sinks:
+            sink.reset()
+
+        while self._pending:
+            self._dispatch(self._pending.popleft())
+
+    def publish(self, event: GameEvent):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None and (
+            loop is self._loop or self._loop is None or self._loop.is_closed()
+        ):
+            self.bind(loop)
+            self._dispatch(event)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+        elif event.is_durable or len(self._pending) < self.PENDING_SIZE:
+            self._pending.append(event)
+        else:
+            logging.warning(
+                "Event bus is not bound, dropped %s for game %s",
+                type(event).__name__, event.game_id,
+            )
+
+    def _dispatch(self, event: GameEvent):
+        for sink in self.sinks:
+            sink.offer(event)
+
+    async def join(self):
+        """Ждёт, пока подписчики обработают всё опубликованное."""
+
+        await asyncio.gather(*(sink.join() for sink in self.sinks))
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = EventBus()
+
+        return cls.__instance
@@ -1,12 +1,89 @@
 import asyncio
+import json
+import math
 import random
+import time
+from bisect import bisect_left
+from functools import cache
 from typing import ClassVar
 from uuid import UUID, uuid4
 
-from app import hr_platform
-from app.logic.enums import WinStatus
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.consumers import SpectatorConsumer
+from app.logic.actor import Command, GameActor
+from app.logic.dashboard import DashboardHub
+from app.logic.enums import GameStatus, GameVariant, WinStatus
+from app.logic.events import (
+    EventBus,
+    GameCreated,
+    GameEnded,
+    PlayerQuit,
+    PlayerResult,
+    TurnStarted,
+)
+from app.logic.indexes import GameIndex
+from app.logic.move_log import MoveLogWriter
 from app.logic.player import Player
 from app.logic.storages import GameStorage
+from app.logic.timers import Timer, TimerScheduler
+from app.logic.ultimate import UltimateBoard
+
+DEFAULT_SYMBOLS = ("X", "O", "Y", "Z")
+WIN_LENGTH = 3
+# Наибольшая сторона поля, она же объявлена платформе в hr_platform/meta.py
+MAX_BOARD_SIZE = 10
+
+WIN_STATUS_TIERS = {
+    WinStatus.WIN: 0,
+    WinStatus.DRAW: 1,
+    WinStatus.LOSE: 1,
+    WinStatus.UNKNOWN: 2,
+}
+
+
+def get_rank_key(player: Player) -> tuple[int, float]:
+    # Дошедшие до конца выше выбывших, выбывшие позже - выше выбывших раньше
+    storage = player.storage
+    eliminated_at = storage.eliminated_at
+    return (
+        WIN_STATUS_TIERS[storage.win_status],
+        -math.inf if eliminated_at is None else -eliminated_at,
+    )
+
+
+@cache
+def get_lines(size: int) -> tuple[tuple[int, ...], ...]:
+    """Все линии из WIN_LENGTH клеток на поле size x size."""
+
+    directions = ((0, 1), (1, 0), (1, 1), (1, -1))
+    lines = []
+
+    for row in range(size):
+        for column in range(size):
+            for d_row, d_column in directions:
+                end_row = row + d_row * (WIN_LENGTH - 1)
+                end_column = column + d_column * (WIN_LENGTH - 1)
+                if 0 <= end_row < size and 0 <= end_column < size:
+                    lines.append(tuple(
+                        (row + d_row * step) * size + column + d_column * step
+                        for step in range(WIN_LENGTH)
+                    ))
+
+    return tuple(lines)
+
+
+@cache
+def get_cell_lines(size: int) -> tuple[tuple[tuple[int, ...], ...], ...]:
+    """Для каждой клетки - линии, проходящие через неё."""
+
+    cell_lines = [[] for _ in range(size * size)]
+    for line in get_lines(size):
+        for cell in line:
+            cell_lines[cell].append(line)
+
+    return tuple(tuple(lines) for lines in cell_lines)
 
 
 class Game:
@@ -23,32 +100,296 @@ class Game:
             Player(player_storage, self.id)
             for player_storage in storage.players
         ]
+        self.players_by_id = {player.id: player for player in self.players}
+        self.rotation: dict[UUID, Player] = {}
+        self.build_rotation()
         self.coros = []
+        self.actor = GameActor()
+        self.turn_timer: Timer | None = None
+        self.game_timer: Timer | None = None
+        self.idle_timer: Timer | None = None
+        # Часы партии идут с первого подключения игрока
+        self.is_started = False
+        self.last_active_at = time.monotonic()
+        # (версия, закодированное состояние) и ожидание следующей версии
+        self.encoded_state: tuple[int, bytes] | None = None
+        self.changed: asyncio.Future | None = None
+
+    def submit(self, command: Command) -> asyncio.Future:
+        """Все изменения игры проходят через её очередь команд."""
+
+        return self.actor.submit(command)
+
+    async def deliver(self, send):
+        await self.actor.deliver(send)
+
+    def arm_timers(self):
+        if self.is_end:
+            # Законченная партия из снимка тоже должна уйти из памяти
+            self.arm_unregister_timer()
+            return
+
+        self.arm_idle_timer(settings.IDLE_GAME_TTL)
+        # Восстановленная начатая партия продолжает отсчёт сразу
+        if self.storage.seq:
+            self.start_clock()
+
+    def start_clock(self):
+        if self.is_started or self.is_end:
+            return
+
+        self.is_started = True
+        if self.storage.game_time_limit:
+            self.game_timer = TimerScheduler.instance().schedule(
+                self.storage.game_time_limit,
+                lambda: self.submit(self.finish_game),
+            )
+        self.arm_turn_timer()
+
+    def arm_turn_timer(self):
+        if self.turn_timer is not None:
+            self.turn_timer.cancel()
+            self.turn_timer = None
+
+        if (
+            self.storage.turn_time_limit
+            and self.is_started
+            and not self.is_end
+        ):
+            player = self.current_player
+            timer = TimerScheduler.instance().schedule(
+                self.storage.turn_time_limit,
+                lambda: self.submit(lambda: self.forfeit(player, timer)),
+            )
+            self.turn_timer = timer
 
-    async def on_end_game(self):
-        await asyncio.gather(*[player.on_end_game() for player in self.players])
+    def arm_unregister_timer(self):
+        TimerScheduler.instance().schedule(
+            settings.ENDED_GAME_TTL, lambda: self.unregister(self.id)
+        )
+
+    def arm_idle_timer(self, delay: float):
+        self.idle_timer = TimerScheduler.instance().schedule(
+            delay, self.check_idle
+        )
+
+    def check_idle(self):
+        """Брошенная партия - без изменений IDLE_GAME_TTL - кончается ничьей.
+
+        Таймер не переставляется на каждый ход: при срабатывании он
+        досыпает остаток от последнего изменения.
+        """
+
+        self.idle_timer = None
+        remaining = (
+            self.last_active_at + settings.IDLE_GAME_TTL - time.monotonic()
+        )
+        if remaining > 0:
+            self.arm_idle_timer(remaining)
+        else:
+            self.submit(self.finish_game)
+
+    def cancel_timers(self):
+        for timer in (self.turn_timer, self.game_timer, self.idle_timer):
+            if timer is not None:
+                timer.cancel()
+
+        self.turn_timer = self.game_timer = self.idle_timer = None
+
+    def build_rotation(self):
+        """Заранее считает, кто ходит после каждого игрока.
+
+        Выбывшие пропускаются, но сами остаются ключами - чтобы передать
+        ход, если выбыл текущий игрок.
+        """
+
+        count = len(self.players)
+        self.rotation = {}
+        for index, player in enumerate(self.players):
+            for step in range(1, count + 1):
+                candidate = self.players[(index + step) % count]
+                if candidate.storage.eliminated_at is None:
+                    self.rotation[player.id] = candidate
+                    break
+
+    @property
+    def active_players(self) -> list["Player"]:
+        return [
+            player for player in self.players
+            if player.storage.eliminated_at is None
+        ]
+
+    async def forfeit(self, player: "Player", timer: Timer | None = None):
+        """Игрок выбывает; последний оставшийся побеждает.
+
+        timer - таймер хода, по которому пришла команда. Если до неё в
+        очереди был ход, таймер уже переставлен и команда устарела.
+        """
+
+        if self.is_end:
+            return
+
+        if timer is not None and (
+            timer is not self.turn_timer or player is not self.current_player
+        ):
+            return
+
+        player.storage.win_status = WinStatus.LOSE
+        player.storage.eliminated_at = self.storage.seq
+        self.build_rotation()
+        EventBus.instance().publish(PlayerQuit(
+            game_id=self.id,
+            player_id=player.id,
+            is_external_created=self.storage.is_external_created,
+        ))
+
+        active_players = self.active_players
+        if len(active_players) > 1:
+            self.on_changed()
+            await player.on_end_game()
+            if player == self.current_player:
+                await self.next_player()
+            return
+
+        self.storage.is_end = True
+        self.storage.current_player_id = active_players[0].id
+        self.distribute_win_status_by_role(WinStatus.WIN)
+        await self.on_end_game()
+
+    def on_changed(self):
+        # Восстановленные из журнала копии не должны попадать в индексы
+        if self.games.get(self.id) is not self:
+            return
+
+        self.storage.version += 1
+        self.last_active_at = time.monotonic()
+        self.notify_changed()
+        GameIndex.instance().update(self)
+        DashboardHub.instance().mark_changed(self.id)
+
+    def notify_changed(self):
+        if self.changed is not None:
+            if not self.changed.done():
+                self.changed.set_result(self.storage.version)
+            self.changed = None
+
+    async def wait_changed(self, after_version: int, timeout: float) -> bool:
+        """Ждёт версию новее after_version, False - если не дождался.
+
+        Все ожидающие одной игры ждут один общий future.
+        """
+
+        if self.storage.version > after_version:
+            return True
+
+        if self.changed is None:
+            self.changed = asyncio.get_running_loop().create_future()
 
-        if self.storage.is_external_created:
-            await hr_platform.add_results(self)
+        try:
+            await asyncio.wait_for(asyncio.shield(self.changed), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def get_encoded_state(self) -> tuple[int, bytes]:
+        """Закодированный снимок игры, пересобирается только при смене версии."""
+
+        version = self.storage.version
+        if self.encoded_state is None or self.encoded_state[0] != version:
+            self.encoded_state = (version, json.dumps(
+                {**self.get_public_snapshot(), "version": version},
+                ensure_ascii=False,
+                cls=DjangoJSONEncoder,
+            ).encode())
+
+        return self.encoded_state
+
+    async def on_end_game(self):
+        self.cancel_timers()
+        self.on_changed()
+        self.arm_unregister_timer()
+        await self.deliver(SpectatorConsumer.broadcast(self.id, {
+            "players": [
+                {"symbol": player.symbol, "win_status": player.storage.win_status}
+                for player in self.players
+            ]
+        }, "end_game", is_final=True))
+        for player in self.players:
+            await player.on_end_game()
+        MoveLogWriter.instance().close(self.id)
+        EventBus.instance().publish(self.get_ended_event())
+
+    def get_positions(self) -> dict[UUID, int]:
+        """Победитель занимает 1 место, остальные - со 2-го по рангу.
+
+        Игроки с одинаковым рангом делят место.
+        """
+
+        keys = {player.id: get_rank_key(player) for player in self.players}
+        ordered = sorted(keys.values())
+
+        positions = {}
+        for player_id, key in keys.items():
+            if key[0] == WIN_STATUS_TIERS[WinStatus.WIN]:
+                positions[player_id] = 1
+            else:
+                better = bisect_left(ordered, key)
+                winners = bisect_left(ordered, (1, -math.inf))
+                positions[player_id] = 2 + better - winners
+        return positions
+
+    def get_ended_event(self) -> GameEnded:
+        positions = self.get_positions()
+        return GameEnded(
+            game_id=self.id,
+            players=tuple(
+                PlayerResult(
+                    id=player.id,
+                    name=player.name,
+                    symbol=player.symbol,
+                    win_status=player.storage.win_status,
+                    position=positions[player.id],
+                )
+                for player in self.players
+            ),
+            map=tuple(self.map),
+            is_external_created=self.storage.is_external_created,
+            is_rated=self.storage.is_rated,
+        )
 
     def attack_point(self, coordinate: int, symbol: str):
-        if self.storage.map[coordinate] is not None:
+        if not 0 <= coordinate < len(self.storage.map):
+            raise ValueError("Координата вне поля")
+
+        ultimate = self.storage.ultimate
+        if ultimate is not None:
+            ultimate.play(self.get_player_index(symbol), coordinate)
+        elif self.storage.map[coordinate] is not None:
             raise ValueError("Координата занята")
 
         self.storage.map[coordinate] = symbol
+        self.storage.moves.append(coordinate)
+        self.storage.seq += 1
+        self.on_changed()
 
         return {
             "coordinate": coordinate,
             "symbol": symbol,
+            "seq": self.storage.seq,
+            "next_board": self.next_board,
         }
 
     async def finish_game(self):
+        if self.is_end:
+            return
+
         self.storage.is_end = True
         self.distribute_win_status_by_role(WinStatus.DRAW)
         await self.on_end_game()
 
     def check_winner(self) -> WinStatus:
-        win_status = self.check_map_winner()
+        moves = self.storage.moves
+        win_status = self.check_map_winner(moves[-1] if moves else None)
 
         if win_status != WinStatus.UNKNOWN:
             self.storage.is_end = True
@@ -58,51 +399,88 @@ class Game:
 
     def distribute_win_status_by_role(self, win_status: WinStatus):
         if win_status == WinStatus.WIN:
+            for player in self.players:
+                player.storage.win_status = WinStatus.LOSE
             self.current_player.storage.win_status = WinStatus.WIN
-            self.get_next_player().storage.win_status = WinStatus.LOSE
         else:
-            for player in self.players:
+            for player in self.active_players:
                 player.storage.win_status = WinStatus.DRAW
 
-    def check_map_winner(self):
-        map = self.map
+    def check_map_winner(self, last_cell: int | None = None):
+        """Проверяет поле; если известен последний ход - только линии через него."""
 
-        for i in range(3):
-            if map[i] == map[i + 3] == map[i + 6] is not None:
-                return WinStatus.WIN
+        if self.storage.ultimate is not None:
+            return self.storage.ultimate.get_win_status()
 
-            if map[i * 3] == map[i * 3 + 1] == map[i * 3 + 2] is not None:
+        map = self.map
+        lines = (
+            get_lines(self.size) if last_cell is None
+            else get_cell_lines(self.size)[last_cell]
+        )
+        for first, *rest in lines:
+            symbol = map[first]
+            if symbol is not None and all(map[cell] == symbol for cell in rest):
                 return WinStatus.WIN
 
-        if map[0] == map[4] == map[8] is not None:
-            return WinStatus.WIN
-
-        if map[2] == map[4] == map[6] is not None:
-            return WinStatus.WIN
-
         if all(map):
             return WinStatus.DRAW
 
         return WinStatus.UNKNOWN
 
-    def get_next_player(self):
-        return self.players[
-            (self.players.index(self.current_player) + 1) % 2
-        ]
+    def get_next_player(self) -> "Player":
+        return self.rotation[self.storage.current_player_id]
 
     async def next_player(self):
         next_player = self.get_next_player()
 
         self.storage.current_player_id = next_player.id
+        self.arm_turn_timer()
+        self.on_changed()
+        EventBus.instance().publish(
+            TurnStarted(game_id=self.id, player_id=next_player.id)
+        )
+        await self.deliver(SpectatorConsumer.broadcast(self.id, {
+            "symbol": next_player.symbol
+        }, "start_turn"))
         await self.current_player.on_start_turn()
 
-    def get_player_by_id(self, player_id: UUID) -> "Player":
-        for player in self.players:
-            if player.id == player_id:
-                return player
+    def get_player_index(self, symbol: str) -> int:
+        for index, player in enumerate(self.players):
+            if player.symbol == symbol:
+                return index
 
         raise ValueError("Игрок не найден")
 
+    def get_player_by_id(self, player_id: UUID) -> "Player":
+        player = self.players_by_id.get(player_id)
+        if player is None:
+            raise ValueError("Игрок не найден")
+        return player
+
+    def get_public_snapshot(self) -> dict:
+        """Снимок для наблюдателей и открытого api/games/<id>/state.
+
+        id игрока в маршруте api/connect - единственное, что нужно, чтобы
+        сесть за него, поэтому здесь игроки видны только по имени и символу.
+        """
+
+        return {
+            "game_id": self.id,
+            "players": [
+                {
+                    "name": player.name,
+                    "symbol": player.symbol,
+                    "win_status": player.storage.win_status,
+                }
+                for player in self.players
+            ],
+            "current_symbol": self.current_player.symbol,
+            "is_end": self.is_end,
+            "variant": self.storage.variant,
+            "next_board": self.next_board,
+            "map": self.map,
+        }
+
     @property
     def current_player(self):
         return self.get_player_by_id(
@@ -113,6 +491,14 @@ class Game:
     def id(self):
         return self.storage.id
 
+    @property
+    def status(self) -> GameStatus:
+        if self.is_end:
+            return GameStatus.ENDED
+        if not self.storage.seq:
+            return GameStatus.WAITING
+        return GameStatus.PLAYING
+
     @property
     def is_end(self):
         return self.storage.is_end
@@ -121,6 +507,15 @@ class Game:
     def map(self):
         return self.storage.map
 
+    @property
+    def size(self) -> int:
+        return math.isqrt(len(self.storage.map))
+
+    @property
+    def next_board(self) -> int | None:
+        ultimate = self.storage.ultimate
+        return ultimate and ultimate.next_board
+
     @classmethod
     def get_game_by_id(cls, game_id: UUID) -> "Game":
         game = cls.games.get(game_id)
@@ -134,16 +529,39 @@ class Game:
         game_id: UUID | None = None,
         player_ids: list[UUID] | None = None,
         player_names: list[str] | None = None,
-        symbols: tuple[str, str] | None = None,
+        symbols: tuple[str, ...] | None = None,
         is_external_created: bool = False,
+        is_rated: bool | None = None,
+        turn_time_limit: int | None = None,
+        game_time_limit: int | None = None,
+        variant: GameVariant = GameVariant.CLASSIC,
+        players_count: int | None = None,
+        board_size: int | None = None,
     ) -> "Game":
-        symbols = symbols or ("X", "O")
+        players_count = players_count or len(player_ids or symbols or "XO")
+        if not 2 <= players_count <= len(DEFAULT_SYMBOLS):
+            raise ValueError(
+                f"Игроков должно быть от 2 до {len(DEFAULT_SYMBOLS)}"
+            )
+
+        symbols = symbols or DEFAULT_SYMBOLS[:players_count]
+        if len(symbols) != players_count or len(set(symbols)) != players_count:
+            raise ValueError("У каждого игрока должен быть свой символ")
+
+        # Поле растёт с числом игроков: 3x3 на двоих, 4x4 на троих
+        board_size = board_size or players_count + 1
+        if board_size < WIN_LENGTH:
+            raise ValueError(f"Поле должно быть не меньше {WIN_LENGTH}x{WIN_LENGTH}")
+        if board_size > MAX_BOARD_SIZE:
+            raise ValueError(
+                f"Поле должно быть не больше {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE}"
+            )
 
         game_id = game_id or uuid4()
-        player_ids = player_ids or [uuid4() for _ in range(2)]
+        player_ids = player_ids or [uuid4() for _ in range(players_count)]
 
         players = []
-        for num_player in range(2):
+        for num_player in range(players_count):
             players.append(
                 Player.create_player(
                     symbol=symbols[num_player],
@@ -154,18 +572,47 @@ class Game:
             )
 
         current_player: Player = random.choice(players)
+        is_ultimate = variant == GameVariant.ULTIMATE
 
         storage = GameStorage(
             id=game_id,
             players=[player.storage for player in players],
             current_player_id=current_player.id,
-            map=[None] * 9,
+            map=[None] * (81 if is_ultimate else board_size * board_size),
             is_external_created=is_external_created,
+            # По умолчанию в рейтинг идут игры, созданные платформой
+            is_rated=is_external_created if is_rated is None else is_rated,
+            turn_time_limit=turn_time_limit,
+            game_time_limit=game_time_limit,
+            variant=variant,
+            ultimate=UltimateBoard(len(players)) if is_ultimate else None,
         )
 
         instance = cls(storage=storage)
-        cls.games[game_id] = instance
+        cls.register(instance)
+        EventBus.instance().publish(GameCreated(
+            game_id=game_id,
+            player_ids=tuple(player.id for player in players),
+            variant=variant,
+            is_external_created=is_external_created,
+        ))
         return instance
 
+    @classmethod
+    def register(cls, game: "Game"):
+        cls.games[game.id] = game
+        game.arm_timers()
+        game.on_changed()
+
+    @classmethod
+    def unregister(cls, game_id: UUID):
+        game = cls.games.pop(game_id, None)
+        if game is not None:
+            game.cancel_timers()
+            game.notify_changed()
+            GameIndex.instance().remove(game)
+            DashboardHub.instance().mark_changed(game_id)
+            SpectatorConsumer.close_feed(game_id, {"detail": "Игра закрыта"})
+
     def __repr__(self):
         return repr(self.storage)
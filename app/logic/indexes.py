@@ -0,0 +1,294 @@
+import heapq
+import threading
+from bisect import bisect_right
+from itertools import islice
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from app.logic.enums import GameStatus
+
+if TYPE_CHECKING:
+    from app.logic.game import Game
+
+OrderKey = tuple[GameStatus | None, bool | None]
+
+
+class ActivityOrder:
+    """Игры по последней активности с доступом по месту за O(log n).
+
+    Изменённая игра дописывается в конец массива слотов со своим тиком,
+    её прежний слот гаснет. Живые слоты считает дерево Фенвика, поэтому
+    игра на любом месте от свежего конца находится спуском по дереву, без
+    обхода. Когда слоты кончаются, массив пересобирается из живых.
+    """
+
+    MIN_CAPACITY = 1024
+
+    def __init__(self):
+        self.slots: dict[UUID, int] = {}
+        self.ids: list[UUID | None] = []
+        self.ticks: list[int] = []
+        self.capacity = self.MIN_CAPACITY
+        self.tree = self.build_tree(0, self.capacity)
+
+    def __len__(self):
+        return len(self.slots)
+
+    @staticmethod
+    def build_tree(size: int, capacity: int) -> list[int]:
+        """Дерево для size живых слотов подряд с начала, за O(capacity)."""
+
+        tree = [0] * (capacity + 1)
+        for index in range(1, capacity + 1):
+            tree[index] += index <= size
+            parent = index + (index & -index)
+            if parent <= capacity:
+                tree[parent] += tree[index]
+        return tree
+
+    def _update(self, slot: int, delta: int):
+        tree = self.tree
+        capacity = self.capacity
+        index = slot + 1
+        while index <= capacity:
+            tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, size: int) -> int:
+        """Сколько живых среди первых size слотов."""
+
+        total = 0
+        while size > 0:
+            total += self.tree[size]
+            size -= size & -size
+        return total
+
+    def _find(self, rank: int) -> int:
+        """Слот живой игры номер rank от старого конца, с нуля."""
+
+        index = 0
+        step = 1 << (self.capacity.bit_length() - 1)
+        while step:
+            if (
+                index + step <= self.capacity
+                and self.tree[index + step] <= rank
+            ):
+                index += step
+                rank -= self.tree[index]
+            step >>= 1
+        return index
+
+    def touch(self, game_id: UUID, tick: int):
+        self.discard(game_id)
+        if len(self.ids) == self.capacity:
+            self._rebuild()
+
+        slot = len(self.ids)
+        self.ids.append(game_id)
+        self.ticks.append(tick)
+        self.slots[game_id] = slot
+        self._update(slot, 1)
+
+    def discard(self, game_id: UUID):
+        slot = self.slots.pop(game_id, None)
+        if slot is not None:
+            self.ids[slot] = None
+            self._update(slot, -1)
+
+    def _rebuild(self):
+        alive = [
+            slot for slot, game_id in enumerate(self.ids)
+            if game_id is not None
+        ]
+        self.ids = [self.ids[slot] for slot in alive]
+        self.ticks = [self.ticks[slot] for slot in alive]
+        self.slots = {game_id: slot for slot, game_id in enumerate(self.ids)}
+        self.capacity = max(2 * len(self.ids), self.MIN_CAPACITY)
+        self.tree = self.build_tree(len(self.ids), self.capacity)
+
+    def count_newer(self, tick: int) -> int:
+        """Сколько игр изменились позже tick."""
+
+        return len(self.slots) - self._prefix(bisect_right(self.ticks, tick))
+
+    def newest(
+        self, limit: int, offset: int = 0, tick: int | None = None
+    ) -> list[tuple[int, UUID]]:
+        """До limit пар (тик, игра) от свежих к старым.
+
+        Пропускает offset самых свежих, с tick - ещё и всех новее него.
+        """
+
+        if tick is None:
+            end = len(self.slots)
+        else:
+            end = self._prefix(bisect_right(self.ticks, tick))
+        end -= offset
+
+        results = []
+        for rank in range(end - 1, max(end - limit, 0) - 1, -1):
+            slot = self._find(rank)
+            results.append((self.ticks[slot], self.ids[slot]))
+        return results
+
+
+class GameIndex:
+    """Вторичные индексы реестра игр.
+
+    Игрок -> игры, внешние/внутренние, статус и порядок по последней
+    активности. Порядок ведётся для всех игр и отдельно для каждого
+    сочетания статуса и признака внешней игры: изменение игры трогает
+    два порядка, а выборка без игрока сливает не больше трёх и стоит
+    O(limit * log n) под блокировкой при любом offset.
+    """
+
+    __instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tick = 0
+        self._touched: dict[UUID, int] = {}
+        self._status: dict[UUID, GameStatus] = {}
+        self._orders: dict[OrderKey, ActivityOrder] = {
+            (status, is_external_created): ActivityOrder()
+            for status in GameStatus
+            for is_external_created in (True, False)
+        }
+        self._orders[None, None] = ActivityOrder()
+        self.by_player: dict[UUID, set[UUID]] = {}
+        self.by_status: dict[GameStatus, set[UUID]] = {
+            status: set() for status in GameStatus
+        }
+        self.by_external: dict[bool, set[UUID]] = {True: set(), False: set()}
+
+    def update(self, game: "Game"):
+        with self._lock:
+            game_id = game.id
+            status = game.status
+            is_external_created = game.storage.is_external_created
+
+            if game_id not in self._status:
+                for player in game.players:
+                    self.by_player.setdefault(player.id, set()).add(game_id)
+                self.by_external[is_external_created].add(game_id)
+
+            old_status = self._status.get(game_id)
+            if old_status != status:
+                if old_status is not None:
+                    self.by_status[old_status].discard(game_id)
+                    self._orders[old_status, is_external_created].discard(
+                        game_id
+                    )
+                self.by_status[status].add(game_id)
+                self._status[game_id] = status
+
+            self._tick += 1
+            self._touched[game_id] = self._tick
+            self._orders[status, is_external_created].touch(
+                game_id, self._tick
+            )
+            self._orders[None, None].touch(game_id, self._tick)
+
+    def remove(self, game: "Game"):
+        with self._lock:
+            game_id = game.id
+            status = self._status.pop(game_id, None)
+            if status is None:
+                return
+
+            is_external_created = game.storage.is_external_created
+            self.by_status[status].discard(game_id)
+            self.by_external[is_external_created].discard(game_id)
+            self._touched.pop(game_id, None)
+            self._orders[status, is_external_created].discard(game_id)
+            self._orders[None, None].discard(game_id)
+
+            for player in game.players:
+                games = self.by_player.get(player.id)
+                if games is None:
+                    continue
+                games.discard(game_id)
+                if not games:
+                    del self.by_player[player.id]
+
+    def get_orders(
+        self, status: GameStatus | None, is_external_created: bool | None
+    ) -> list[ActivityOrder]:
+        if status is None and is_external_created is None:
+            return [self._orders[None, None]]
+
+        return [
+            order for (order_status, order_external), order
+            in self._orders.items()
+            if order_status is not None
+            and status in (None, order_status)
+            and is_external_created in (None, order_external)
+        ]
+
+    def get_newest(
+        self, orders: list[ActivityOrder], offset: int, limit: int
+    ) -> list[UUID]:
+        if len(orders) == 1:
+            return [
+                game_id for _, game_id in orders[0].newest(limit, offset)
+            ]
+
+        # Тик игры на месте offset - наименьший, новее которого не больше
+        # offset игр во всех порядках вместе
+        low, high = 0, self._tick
+        while low < high:
+            middle = (low + high) // 2
+            if sum(order.count_newer(middle) for order in orders) <= offset:
+                high = middle
+            else:
+                low = middle + 1
+
+        merged = heapq.merge(
+            *(order.newest(limit, tick=low) for order in orders),
+            reverse=True,
+        )
+        return [game_id for _, game_id in islice(merged, limit)]
+
+    def query(
+        self,
+        player_id: UUID | None = None,
+        status: GameStatus | None = None,
+        is_external_created: bool | None = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> list[UUID]:
+        """Возвращает id игр, от самой недавно активной к старой."""
+
+        with self._lock:
+            if player_id is None:
+                return self.get_newest(
+                    self.get_orders(status, is_external_created),
+                    offset,
+                    limit,
+                )
+
+            filters = []
+            if status is not None:
+                filters.append(self.by_status[status])
+            if is_external_created is not None:
+                filters.append(self.by_external[is_external_created])
+
+            # Игр у игрока мало, их дешевле отсортировать
+            candidates = sorted(
+                (
+                    game_id for game_id in self.by_player.get(player_id, ())
+                    if all(game_id in games for games in filters)
+                ),
+                key=self._touched.__getitem__,
+                reverse=True,
+            )
+            return candidates[offset:offset + limit]
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = GameIndex()
+
+        return cls.__instance
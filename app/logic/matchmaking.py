@@ -0,0 +1,283 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import ClassVar, TYPE_CHECKING
+
+from app.logic.game import Game
+from app.logic.rating import DEFAULT_RATING, Leaderboard
+
+if TYPE_CHECKING:
+    from app.consumers import MatchmakingConsumer
+
+QueueKey = tuple[int | None, str | None]
+
+
+@dataclass(eq=False)
+class Ticket:
+    consumer: "MatchmakingConsumer"
+    rating: int | None = None
+    symbol: str | None = None
+    order: int = 0
+    enqueued_at: float = 0.0
+    is_active: bool = field(default=False, init=False)
+
+
+class RatingPool(Leaderboard):
+    """Ждущие билеты одного символа по рейтингу.
+
+    То же дерево Фенвика, что у таблицы лидеров, только корзины целые, а
+    в корзинах лежат билеты в порядке постановки: ближайшие по рейтингу
+    соседи находятся за O(log), без сортировки всей очереди.
+    """
+
+    RESOLUTION = 1
+
+    def get_nearest(self, ticket: Ticket, rating: float) -> list[Ticket]:
+        """Старший билет в своей корзине и в соседних сверху и снизу."""
+
+        index = self.get_index(rating)
+        above = self.count_above(index)
+        bucket = self.buckets.get(index, {})
+
+        candidates = [
+            next((other for other in bucket if other is not ticket), None)
+        ]
+        if above:
+            candidates.append(next(iter(self.buckets[self.find(above - 1)])))
+        below = above + len(bucket)
+        if below < self.size:
+            candidates.append(next(iter(self.buckets[self.find(below)])))
+
+        return [candidate for candidate in candidates if candidate is not None]
+
+
+class Matchmaker:
+    """Очередь быстрой игры.
+
+    Игроки делятся на корзины по диапазону рейтинга и предпочитаемому
+    символу, внутри корзины - куча по порядку постановки. Выход из кучи
+    ленивый: билет помечается неактивным и выбрасывается при извлечении,
+    а куча, наполовину состоящая из вышедших, пересобирается. Раз в TICK
+    секунд все корзины разбираются на пары пачкой.
+
+    Кто не нашёл пару в своей корзине, с каждыми WIDEN_INTERVAL секундами
+    ожидания ищет соперника ещё на RATING_BAND дальше от своего рейтинга,
+    в том числе среди игроков без рейтинга (для них берётся начальный).
+    Сроки расширения лежат в куче, так что за тик просматриваются только
+    билеты, у которых охват вырос, а ближайший соперник берётся из
+    RatingPool своего символа.
+    """
+
+    SYMBOLS: ClassVar[tuple[str, str]] = ("X", "O")
+    RATING_BAND = 100
+    WIDEN_INTERVAL = 5
+    TICK = 0.5
+    __instance = None
+
+    def __init__(self):
+        self._queues: dict[QueueKey, list[tuple[int, Ticket]]] = defaultdict(list)
+        # Сколько вышедших билетов ещё лежит в куче корзины
+        self._dead: dict[QueueKey, int] = defaultdict(int)
+        self._pools = {symbol: RatingPool() for symbol in (*self.SYMBOLS, None)}
+        # (срок следующего расширения, порядок, билет)
+        self._widening: list[tuple[float, int, Ticket]] = []
+        self._counter = itertools.count()
+        self._task: asyncio.Task | None = None
+        self.size = 0
+
+    def band(self, rating: int | None) -> int | None:
+        if rating is None:
+            return None
+        return int(rating) // self.RATING_BAND
+
+    def get_key(self, ticket: Ticket) -> QueueKey:
+        return self.band(ticket.rating), ticket.symbol
+
+    def enqueue(self, ticket: Ticket, now: float | None = None):
+        if ticket.symbol not in (*self.SYMBOLS, None):
+            raise ValueError("Неизвестный символ")
+
+        if ticket.rating is not None and (
+            isinstance(ticket.rating, bool) or not isinstance(ticket.rating, int)
+        ):
+            raise ValueError("Рейтинг должен быть целым числом")
+
+        ticket.order = next(self._counter)
+        ticket.enqueued_at = time.monotonic() if now is None else now
+        ticket.is_active = True
+        self._push(self.get_key(ticket), ticket)
+        self._pools[ticket.symbol].add(ticket, self.get_rating(ticket))
+        heapq.heappush(self._widening, (
+            ticket.enqueued_at + self.WIDEN_INTERVAL, ticket.order, ticket
+        ))
+        self.size += 1
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, ticket: Ticket):
+        if not ticket.is_active:
+            return
+
+        ticket.is_active = False
+        self.size -= 1
+        self._pools[ticket.symbol].remove(ticket, self.get_rating(ticket))
+
+        key = self.get_key(ticket)
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+
+        self._dead[key] += 1
+        if 2 * self._dead[key] > len(queue):
+            queue[:] = [item for item in queue if item[1].is_active]
+            heapq.heapify(queue)
+            self._dead[key] = 0
+            if not queue:
+                del self._queues[key]
+
+    def _push(self, key: QueueKey, ticket: Ticket):
+        heapq.heappush(self._queues[key], (ticket.order, ticket))
+
+    def _pop(self, key: QueueKey) -> Ticket | None:
+        queue = self._queues.get(key)
+        ticket = None
+        while queue:
+            _, candidate = heapq.heappop(queue)
+            if candidate.is_active:
+                ticket = candidate
+                break
+            self._dead[key] -= 1
+
+        if queue is not None and not queue:
+            del self._queues[key]
+        return ticket
+
+    def _pair_queues(
+        self, first: QueueKey, second: QueueKey
+    ) -> list[tuple[Ticket, Ticket]]:
+        pairs = []
+        while True:
+            ticket = self._pop(first)
+            if ticket is None:
+                break
+
+            opponent = self._pop(second)
+            if opponent is None:
+                self._push(first, ticket)
+                break
+
+            # Из куч билеты уже извлечены, остальное снимет cancel
+            self.cancel(ticket)
+            self.cancel(opponent)
+            pairs.append((ticket, opponent))
+
+        return pairs
+
+    def get_reach(self, ticket: Ticket, now: float) -> int:
+        """На сколько рейтинга ticket готов отойти от своего."""
+
+        steps = int((now - ticket.enqueued_at) // self.WIDEN_INTERVAL)
+        return steps * self.RATING_BAND
+
+    def get_rating(self, ticket: Ticket) -> int | float:
+        return DEFAULT_RATING if ticket.rating is None else ticket.rating
+
+    def get_partners(self, symbol: str | None) -> tuple[str | None, ...]:
+        x, o = self.SYMBOLS
+        if symbol == x:
+            return o, None
+        if symbol == o:
+            return x, None
+        return x, o, None
+
+    def _find_nearest(self, ticket: Ticket, reach: int) -> Ticket | None:
+        rating = self.get_rating(ticket)
+        best = None
+        best_key = None
+
+        for symbol in self.get_partners(ticket.symbol):
+            for candidate in self._pools[symbol].get_nearest(ticket, rating):
+                distance = abs(self.get_rating(candidate) - rating)
+                key = (distance, candidate.order)
+                if distance <= reach and (best_key is None or key < best_key):
+                    best, best_key = candidate, key
+
+        return best
+
+    def _pair_widened(self, now: float) -> list[tuple[Ticket, Ticket]]:
+        """Пары для тех, у кого к этому тику вырос охват.
+
+        Старшие по ожиданию выбирают первыми ближайшего по рейтингу
+        соперника в пределах своего охвата; не нашедший ждёт следующего
+        расширения.
+        """
+
+        pairs = []
+        widening = self._widening
+        while widening and widening[0][0] <= now:
+            _, order, ticket = heapq.heappop(widening)
+            if not ticket.is_active:
+                continue
+
+            reach = self.get_reach(ticket, now)
+            opponent = self._find_nearest(ticket, reach)
+            if opponent is None:
+                steps = reach // self.RATING_BAND + 1
+                heapq.heappush(widening, (
+                    ticket.enqueued_at + steps * self.WIDEN_INTERVAL,
+                    order,
+                    ticket,
+                ))
+                continue
+
+            self.cancel(ticket)
+            self.cancel(opponent)
+            pairs.append((ticket, opponent))
+
+        return pairs
+
+    def pair(self, now: float | None = None) -> list[tuple[Ticket, Ticket]]:
+        x, o = self.SYMBOLS
+        pairs = []
+
+        for band in {band for band, _ in self._queues}:
+            pairs += self._pair_queues((band, x), (band, o))
+            pairs += self._pair_queues((band, x), (band, None))
+            pairs += self._pair_queues((band, o), (band, None))
+            pairs += self._pair_queues((band, None), (band, None))
+
+        pairs += self._pair_widened(time.monotonic() if now is None else now)
+        return pairs
+
+    def get_symbols(self, ticket: Ticket, opponent: Ticket) -> tuple[str, str]:
+        x, o = self.SYMBOLS
+        if ticket.symbol == o or opponent.symbol == x:
+            return o, x
+        return x, o
+
+    async def _run(self):
+        while self.size > 0:
+            await asyncio.sleep(self.TICK)
+
+            coros = []
+            for ticket, opponent in self.pair():
+                game = Game.create_game(
+                    symbols=self.get_symbols(ticket, opponent)
+                )
+                for match, player in zip((ticket, opponent), game.players):
+                    coros.append(match.consumer.on_matched(game, player))
+
+            await asyncio.gather(*coros, return_exceptions=True)
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = Matchmaker()
+
+        return cls.__instance
@@ -0,0 +1,196 @@
+"""Отчёт о памяти процесса: tracemalloc и счётчики доменных объектов."""
+import gc
+import sys
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from enum import Enum
+from itertools import count
+from types import FunctionType, ModuleType
+
+from app.logic.timers import Timer, TimerScheduler
+
+MAX_TRACE_DURATION = 300
+MAX_FRAMES = 25
+MAX_SNAPSHOTS = 4
+SIZE_SAMPLE = 50
+
+# Отчёт строится в потоке запроса, а трассировку выключает таймер на
+# цикле событий
+_lock = threading.Lock()
+_snapshots: OrderedDict[int, tracemalloc.Snapshot] = OrderedDict()
+_snapshot_ids = count(1)
+_stop_timer: Timer | None = None
+
+
+def start_tracing(frames: int = 1, duration: float = 60):
+    """Включает tracemalloc не дольше чем на MAX_TRACE_DURATION секунд."""
+
+    global _stop_timer
+
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(min(max(frames, 1), MAX_FRAMES))
+
+        if _stop_timer is not None:
+            _stop_timer.cancel()
+        _stop_timer = TimerScheduler.instance().schedule(
+            min(duration, MAX_TRACE_DURATION), stop_tracing
+        )
+
+
+def stop_tracing():
+    global _stop_timer
+
+    with _lock:
+        if _stop_timer is not None:
+            _stop_timer.cancel()
+            _stop_timer = None
+
+        tracemalloc.stop()
+        _snapshots.clear()
+
+
+def take_snapshot() -> int:
+    if not tracemalloc.is_tracing():
+        raise ValueError("Трассировка не запущена")
+
+    snapshot = tracemalloc.take_snapshot()
+    with _lock:
+        snapshot_id = next(_snapshot_ids)
+        _snapshots[snapshot_id] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+
+    return snapshot_id
+
+
+def _format_stats(stats, limit: int) -> list[dict]:
+    return [
+        {
+            "site": str(stat.traceback),
+            "size": stat.size,
+            "count": stat.count,
+            **(
+                {"size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                if isinstance(stat, tracemalloc.StatisticDiff) else {}
+            ),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def top_allocations(limit: int = 20, compare_to: int | None = None) -> list[dict]:
+    if not tracemalloc.is_tracing():
+        return []
+
+    snapshot = tracemalloc.take_snapshot()
+    if compare_to is None:
+        return _format_stats(snapshot.statistics("lineno"), limit)
+
+    with _lock:
+        previous = _snapshots.get(compare_to)
+    if previous is None:
+        raise ValueError("Снимок не найден")
+
+    return _format_stats(snapshot.compare_to(previous, "lineno"), limit)
+
+
+def _deep_size(obj, stop_types: tuple[type, ...]) -> int:
+    """Приблизительный размер объекта вместе с тем, чем он владеет.
+
+    Обход не заходит в другие доменные объекты и в разделяемые объекты:
+    классы, модули, функции и члены перечислений.
+    """
+
+    seen = {id(obj)}
+    stack = [obj]
+    size = 0
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        for referent in gc.get_referents(item):
+            if (
+                id(referent) in seen
+                or isinstance(referent, (type, ModuleType, FunctionType, Enum))
+                or isinstance(referent, stop_types)
+            ):
+                continue
+            seen.add(id(referent))
+            stack.append(referent)
+
+    return size
+
+
+def domain_objects() -> dict[str, dict]:
+    """Живые доменные объекты по классам, включая недостижимые из реестров."""
+
+    from app.consumers import BaseConsumer
+    from app.logic.game import Game
+    from app.logic.player import Player
+    from app.logic.storages import GameStorage, PlayerStorage
+
+    domain_types = (Game, Player, GameStorage, PlayerStorage, BaseConsumer)
+
+    counts: Counter[str] = Counter()
+    samples: dict[str, list] = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, domain_types):
+            name = type(obj).__name__
+            counts[name] += 1
+            sample = samples.setdefault(name, [])
+            if len(sample) < SIZE_SAMPLE:
+                sample.append(obj)
+
+    report = {}
+    for name, total in counts.most_common():
+        sample = samples[name]
+        average = sum(_deep_size(obj, domain_types) for obj in sample) / len(sample)
+        report[name] = {
+            "count": total,
+            "approx_size": int(average * total),
+        }
+
+    return report
+
+
+def registries() -> dict[str, int]:
+    from app.consumers import GameConsumer, SpectatorConsumer
+    from app.logic.game import Game
+
+    return {
+        "games": len(Game.games),
+        "connects": len(GameConsumer.connects),
+        "spectated_games": len(SpectatorConsumer.spectators),
+        "timers": len(TimerScheduler.instance()),
+    }
+
+
+def report(
+    limit: int = 20,
+    compare_to: int | None = None,
+    include_objects: bool = False,
+) -> dict:
+    """Отчёт о памяти.
+
+    Подсчёт доменных объектов обходит всю кучу, поэтому он делается
+    только по явному запросу include_objects.
+    """
+
+    current, peak = (
+        tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    )
+    with _lock:
+        snapshots = list(_snapshots)
+
+    result = {
+        "tracing": tracemalloc.is_tracing(),
+        "traced": {"current": current, "peak": peak},
+        "snapshots": snapshots,
+        "top": top_allocations(limit, compare_to),
+        "registries": registries(),
+    }
+    if include_objects:
+        result["objects"] = domain_objects()
+
+    return result
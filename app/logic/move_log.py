@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, TYPE_CHECKING
+from uuid import UUID
+
+from django.conf import settings
+
+from app.logic.enums import WinStatus
+from app.logic.storages import GameStorage, PlayerStorage
+from app.logic.ultimate import UltimateBoard
+
+if TYPE_CHECKING:
+    from app.logic.game import Game
+
+# seq, индекс игрока, клетка, monotonic_ns
+RECORD = struct.Struct("<IBBxxQ")
+
+
+class MoveRecord(NamedTuple):
+    seq: int
+    player_index: int
+    cell: int
+    timestamp: int
+
+
+class MoveLogWriter:
+    """Журнал ходов: по файлу на игру, записи фиксированного размера.
+
+    Запись идёт в page cache сразу, fsync выполняется пачкой по всем
+    изменённым играм раз в FSYNC_INTERVAL секунд в отдельном потоке,
+    чтобы не останавливать цикл событий. Открытыми держатся не больше
+    MAX_OPEN_FILES файлов недавно ходивших игр, остальные закрываются и
+    при следующем ходе открываются заново.
+    """
+
+    FSYNC_INTERVAL = 0.5
+    MAX_OPEN_FILES = 1024
+    __instance = None
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._fds: OrderedDict[UUID, int] = OrderedDict()
+        self._dirty: set[UUID] = set()
+        self._flush_task: asyncio.Task | None = None
+        # Один поток: fsync и close одного дескриптора не пересекаются
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="move-log")
+
+    def path(self, game_id: UUID) -> Path:
+        return self.directory / f"{game_id}.log"
+
+    def _get_fd(self, game_id: UUID) -> int:
+        fd = self._fds.get(game_id)
+        if fd is not None:
+            self._fds.move_to_end(game_id)
+            return fd
+
+        fd = os.open(
+            self.path(game_id),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o644,
+        )
+        self._fds[game_id] = fd
+
+        if len(self._fds) > self.MAX_OPEN_FILES:
+            self.close(next(iter(self._fds)))
+
+        return fd
+
+    def append(self, game_id: UUID, seq: int, player_index: int, cell: int):
+        os.write(
+            self._get_fd(game_id),
+            RECORD.pack(seq, player_index, cell, time.monotonic_ns()),
+        )
+        self._dirty.add(game_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.FSYNC_INTERVAL)
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._sync, self._take_dirty()
+        )
+
+    def _take_dirty(self) -> list[int]:
+        dirty, self._dirty = self._dirty, set()
+        return [
+            self._fds[game_id] for game_id in dirty if game_id in self._fds
+        ]
+
+    @staticmethod
+    def _sync(fds: list[int]):
+        for fd in fds:
+            os.fsync(fd)
+
+    @staticmethod
+    def _sync_and_close(fd: int, is_dirty: bool):
+        try:
+            if is_dirty:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self):
+        """Синхронный fsync всего изменённого - вне цикла событий."""
+
+        self._executor.submit(self._sync, self._take_dirty()).result()
+
+    def close(self, game_id: UUID):
+        fd = self._fds.pop(game_id, None)
+        if fd is None:
+            return
+
+        is_dirty = game_id in self._dirty
+        self._dirty.discard(game_id)
+        future = self._executor.submit(self._sync_and_close, fd, is_dirty)
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if future.exception() is not None:
+            logging.error("Move log close failed", exc_info=future.exception())
+
+    def read(self, game_id: UUID) -> list[MoveRecord]:
+        try:
+            file = open(self.path(game_id), "rb")
+        except FileNotFoundError:
+            return []
+
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            size -= size % RECORD.size
+            if not size:
+                return []
+
+            with (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+                memoryview(data)[:size] as view,
+            ):
+                return [
+                    MoveRecord(*record)
+                    for record in RECORD.iter_unpack(view)
+                ]
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = MoveLogWriter(settings.MOVE_LOG_DIR)
+
+        return cls.__instance
+
+
+def replay(game: "Game", seq: int | None = None) -> "Game":
+    """Восстанавливает состояние игры на момент хода seq.
+
+    Игроки и символы берутся из game, ходы - из журнала. Возвращаемая
+    игра не регистрируется в Game.games.
+    """
+
+    from app.logic.game import Game
+
+    records = MoveLogWriter.instance().read(game.id)
+    if seq is not None:
+        records = [record for record in records if record.seq <= seq]
+
+    players = [
+        PlayerStorage(
+            id=player.id,
+            name=player.name,
+            symbol=player.symbol,
+        )
+        for player in game.players
+    ]
+    current_player_id = (
+        players[records[0].player_index].id if records
+        else game.storage.current_player_id
+    )
+    replayed = Game(GameStorage(
+        id=game.id,
+        players=players,
+        current_player_id=current_player_id,
+        map=[None] * len(game.map),
+        is_external_created=game.storage.is_external_created,
+        is_rated=game.storage.is_rated,
+        variant=game.storage.variant,
+        ultimate=(
+            UltimateBoard(len(players))
+            if game.storage.ultimate is not None else None
+        ),
+    ))
+
+    for record in records:
+        player = replayed.players[record.player_index]
+        replayed.storage.current_player_id = player.id
+        replayed.attack_point(record.cell, player.symbol)
+
+        if replayed.check_winner() == WinStatus.UNKNOWN:
+            replayed.storage.current_player_id = replayed.get_next_player().id
+
+    return replayed
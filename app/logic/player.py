@@ -1,8 +1,11 @@
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 from uuid import UUID, uuid4
 
 from app.consumers import GameConsumer
 from app.logic.enums import WinStatus
+from app.logic.events import EventBus, MoveMade
+from app.logic.move_log import MoveLogWriter
 from app.logic.storages import PlayerStorage
 
 if TYPE_CHECKING:
@@ -10,23 +13,51 @@ if TYPE_CHECKING:
 
 
 class Player:
+    # Сколько последних move_id помнить для повторных отправок
+    ACK_WINDOW = 32
+
     def __init__(self, storage: PlayerStorage, game_id: UUID):
         self.storage = storage
         self.game_id = game_id
-
-    async def on_connect(self):
-        await self.send_message(
-            {
-                "player": {
-                    "id": self.id,
-                    "name": self.name,
-                    "symbol": self.symbol,
-                    "is_turn": self.game.current_player == self,
-                    "win_status": self.storage.win_status,
-                },
-                "map": self.game.map,
-            }, "syncronize"
-        )
+        self.acks: OrderedDict[str, dict] | None = None
+
+    async def on_connect(self, last_seq: int | None = None):
+        """Синхронизирует игрока и запускает часы партии.
+
+        Если клиент прислал последний увиденный seq, вместо всей карты
+        отправляются только ходы после него.
+        """
+
+        game = self.game
+        game.start_clock()
+        message = {
+            "player": {
+                "id": self.id,
+                "name": self.name,
+                "symbol": self.symbol,
+                "is_turn": game.current_player == self,
+                "win_status": self.storage.win_status,
+            },
+            "seq": game.storage.seq,
+            "variant": game.storage.variant,
+            "next_board": game.next_board,
+        }
+
+        if last_seq is not None and 0 <= last_seq <= game.storage.seq:
+            message["moves"] = [
+                {
+                    "seq": seq,
+                    "coordinate": coordinate,
+                    "symbol": game.map[coordinate],
+                }
+                for seq, coordinate in enumerate(
+                    game.storage.moves[last_seq:], start=last_seq + 1
+                )
+            ]
+        else:
+            message["map"] = game.map
+
+        await self.send_message(message, "syncronize")
 
     async def on_start_turn(self):
         await self.send_message(
@@ -43,12 +74,49 @@ class Player:
         )
 
     async def attack(self, data: dict):
+        if not isinstance(data, dict):
+            raise ValueError("Неверный формат хода")
+
+        move_id = data.get('move_id')
+        if move_id is not None and (
+            isinstance(move_id, bool) or not isinstance(move_id, (str, int))
+        ):
+            raise ValueError("move_id должен быть строкой или числом")
+
+        if self.acks is not None and move_id in self.acks:
+            await self.send_ack(self.acks[move_id])
+            return
+
         self.check_game()
 
-        attack = self.game.attack_point(
-            data['coordinate'],
-            self.symbol
+        coordinate = data.get('coordinate')
+        if isinstance(coordinate, bool) or not isinstance(coordinate, int):
+            raise ValueError("Координата должна быть целым числом")
+
+        attack = self.game.attack_point(coordinate, self.symbol)
+        MoveLogWriter.instance().append(
+            self.game.id,
+            attack["seq"],
+            self.game.players.index(self),
+            attack["coordinate"],
         )
+        EventBus.instance().publish(MoveMade(
+            game_id=self.game.id,
+            seq=attack["seq"],
+            player_id=self.id,
+            coordinate=attack["coordinate"],
+            symbol=self.symbol,
+        ))
+
+        ack = {"move_id": move_id, "seq": attack["seq"]}
+        if move_id is not None:
+            if self.acks is None:
+                self.acks = OrderedDict()
+            self.acks[move_id] = ack
+            if len(self.acks) > self.ACK_WINDOW:
+                self.acks.popitem(last=False)
+
+        await self.send_ack(ack)
         await self.receive_message(attack)
 
         if self.game.check_winner() != WinStatus.UNKNOWN:
@@ -64,17 +132,27 @@ class Player:
         if self.game.current_player != self:
             raise ValueError("Ходит другой игрок!")
 
+    async def send_ack(self, ack: dict):
+        # Подтверждение уходит сразу, не дожидаясь рассылки остальным
+        consumer = self.consumer
+        if consumer:
+            await consumer.send_game_message(self.game_id, ack, "ack")
+
     async def send_message(self, message: dict, action: str | None = None):
         consumer = self.consumer
         if not consumer:
             return
-        await consumer.send_message(message, action)
+        await self.game.deliver(
+            consumer.send_game_message(self.game_id, message, action)
+        )
 
     async def receive_message(self, message: dict, action: str | None = None):
         consumer = self.consumer
         if not consumer:
             return
-        await consumer.receive_game_players(self.game, message, action)
+        await self.game.deliver(
+            consumer.receive_game_players(self.game, message, action)
+        )
 
     @property
     def consumer(self):
@@ -0,0 +1,286 @@
+"""Рейтинг Эло игроков платформы и таблица лидеров.
+
+Рейтинг пересчитывается по событию GameEnded только для участников
+игры. Изменившиеся записи дописываются в NDJSON-журнал одной записью на
+пачку событий; при загрузке берётся последняя запись игрока, а
+разросшийся журнал переписывается заново.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from uuid import UUID
+
+from django.conf import settings
+
+from app.logic.enums import WinStatus
+from app.logic.events import GameEnded, PlayerResult
+
+DEFAULT_RATING = 1500.0
+
+
+@dataclass(slots=True)
+class PlayerRating:
+    id: UUID
+    name: str
+    rating: float = DEFAULT_RATING
+    games: int = 0
+    wins: int = 0
+
+
+class Leaderboard:
+    """Порядковая статистика по рейтингам.
+
+    Рейтинг хранится с точностью до сотых, поэтому у каждого его значения
+    своя корзина, а число игроков в корзинах хранится деревом Фенвика:
+    место игрока и начало любой страницы находятся за O(log), без
+    сортировки всех игроков. Рейтинги вне [0, MAX_RATING) попадают в
+    крайние корзины.
+    """
+
+    MAX_RATING = 4096
+    RESOLUTION = 100
+
+    def __init__(self):
+        self.length = self.MAX_RATING * self.RESOLUTION
+        # Индекс 1 - самая высокая корзина
+        self.tree = [0] * (self.length + 1)
+        self.buckets: dict[int, dict[UUID, None]] = {}
+        self.size = 0
+
+    def get_index(self, rating: float) -> int:
+        bucket = min(max(round(rating * self.RESOLUTION), 0), self.length - 1)
+        return self.length - bucket
+
+    def update(self, index: int, delta: int):
+        while index <= self.length:
+            self.tree[index] += delta
+            index += index & -index
+
+    def count_above(self, index: int) -> int:
+        """Сколько игроков в корзинах выше index."""
+
+        index -= 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, position: int) -> int:
+        """Корзина игрока на месте position, считая сверху с нуля."""
+
+        index = 0
+        step = 1 << (self.length.bit_length() - 1)
+        while step:
+            if (
+                index + step <= self.length
+                and self.tree[index + step] <= position
+            ):
+                index += step
+                position -= self.tree[index]
+            step >>= 1
+        return index + 1
+
+    def add(self, player_id: UUID, rating: float):
+        index = self.get_index(rating)
+        self.buckets.setdefault(index, {})[player_id] = None
+        self.update(index, 1)
+        self.size += 1
+
+    def remove(self, player_id: UUID, rating: float):
+        index = self.get_index(rating)
+        bucket = self.buckets[index]
+        del bucket[player_id]
+        if not bucket:
+            del self.buckets[index]
+        self.update(index, -1)
+        self.size -= 1
+
+    def get_rank(self, rating: float) -> int:
+        """Место рейтинга, игроки с равным рейтингом делят место."""
+
+        return self.count_above(self.get_index(rating)) + 1
+
+    def get_top(self, limit: int, offset: int = 0) -> list[tuple[int, UUID]]:
+        """Страница таблицы: пары (место, id игрока)."""
+
+        results = []
+        position = offset
+        while len(results) < limit and position < self.size:
+            index = self.find(position)
+            above = self.count_above(index)
+            bucket = list(self.buckets[index])
+
+            for player_id in bucket[position - above:]:
+                results.append((above + 1, player_id))
+                if len(results) == limit:
+                    break
+
+            position = above + len(bucket)
+
+        return results
+
+
+class RatingBook:
+    """Рейтинги игроков с платформы.
+
+    Учитываются только игры с is_rated - созданные платформой и
+    турнирные: участники остальных одноразовые. Синхронные представления
+    читают рейтинг из потоков, пока шина событий меняет его в цикле,
+    поэтому и запись, и чтение идут под блокировкой.
+    """
+
+    K_FACTOR = 32
+    __instance = None
+
+    def __init__(self, path: Path | None = None):
+        self.ratings: dict[UUID, PlayerRating] = {}
+        self.leaderboard = Leaderboard()
+        self.path = Path(path) if path else None
+        self._file = None
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.load()
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def load(self):
+        try:
+            file = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        lines = 0
+        skipped = 0
+        with file:
+            for number, line in enumerate(file, start=1):
+                try:
+                    record = json.loads(line)
+                    record["id"] = UUID(record["id"])
+                    self.ratings[record["id"]] = PlayerRating(**record)
+                except (ValueError, KeyError, TypeError) as e:
+                    # Обычно это недописанная при падении последняя строка
+                    logging.warning(
+                        "Skipping corrupt line %s of %s: %s", number, self.path, e
+                    )
+                    skipped += 1
+                    continue
+                lines += 1
+
+        for record in self.ratings.values():
+            self.leaderboard.add(record.id, record.rating)
+
+        # Журнал без битых строк, иначе дописывание склеится с обрывком
+        if skipped or lines > 2 * len(self.ratings):
+            self.compact()
+
+    def compact(self):
+        """Оставляет в журнале по одной записи на игрока."""
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.serialize(self.ratings.values()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def serialize(records) -> str:
+        return "".join(
+            json.dumps(asdict(record), ensure_ascii=False, default=str) + "\n"
+            for record in records
+        )
+
+    @staticmethod
+    def get_expected(rating: float, other: float) -> float:
+        return 1 / (1 + 10 ** ((other - rating) / 400))
+
+    @staticmethod
+    def get_score(result: PlayerResult, other: PlayerResult) -> float:
+        if result.position == other.position:
+            return 0.5
+        return 1.0 if result.position < other.position else 0.0
+
+    def apply(self, event: GameEnded) -> list[PlayerRating]:
+        """Пересчитывает рейтинг участников игры попарно по их местам."""
+
+        players = event.players
+        if not event.is_rated or len(players) < 2:
+            return []
+
+        records = [
+            self.ratings.get(player.id) or PlayerRating(player.id, player.name)
+            for player in players
+        ]
+        before = [record.rating for record in records]
+        k_factor = self.K_FACTOR / (len(players) - 1)
+
+        for number, (record, result) in enumerate(zip(records, players)):
+            delta = sum(
+                self.get_score(result, other)
+                - self.get_expected(before[number], before[other_number])
+                for other_number, other in enumerate(players)
+                if other_number != number
+            )
+
+            if record.id in self.ratings:
+                self.leaderboard.remove(record.id, record.rating)
+            else:
+                self.ratings[record.id] = record
+
+            record.name = result.name
+            record.rating = round(record.rating + k_factor * delta, 2)
+            record.games += 1
+            record.wins += result.win_status == WinStatus.WIN
+            self.leaderboard.add(record.id, record.rating)
+
+        return records
+
+    def on_games_ended(self, events: list[GameEnded]):
+        """Обработчик шины событий: пачка игр - одна запись в журнал."""
+
+        with self._lock:
+            changed = {}
+            for event in events:
+                for record in self.apply(event):
+                    changed[record.id] = record
+
+            if changed and self._file is not None:
+                self._file.write(self.serialize(changed.values()))
+
+    def get_state(self, record: PlayerRating, rank: int) -> dict:
+        return {"rank": rank, **asdict(record)}
+
+    def get_player_state(self, player_id: UUID) -> dict:
+        """Запись игрока вместе с местом, снятые в один момент."""
+
+        with self._lock:
+            record = self.ratings.get(player_id)
+            if record is None:
+                raise ValueError("Игрок не найден в рейтинге")
+            return self.get_state(
+                record, self.leaderboard.get_rank(record.rating)
+            )
+
+    def get_leaderboard(self, limit: int, offset: int = 0) -> dict:
+        with self._lock:
+            return {
+                "total": self.leaderboard.size,
+                "results": [
+                    self.get_state(self.ratings[player_id], rank)
+                    for rank, player_id in self.leaderboard.get_top(limit, offset)
+                ],
+            }
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = RatingBook(settings.RATINGS_PATH)
+
+        return cls.__instance
@@ -0,0 +1,130 @@
+import atexit
+import dataclasses
+import gc
+import logging
+import os
+import pickle
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.logic.game import Game
+from app.logic.storages import GameStorage, PlayerStorage
+
+SNAPSHOT_VERSION = 6
+
+
+@contextmanager
+def gc_paused():
+    """Сборщик мусора на сотнях тысяч новых объектов тратит больше времени,
+    чем сам pickle, поэтому на время снимка он выключается."""
+
+    is_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if is_enabled:
+            gc.enable()
+
+
+def save_snapshot(path: Path) -> int:
+    """Сохраняет все живые игры в файл, возвращает их количество.
+
+    Пишет во временный файл и атомарно подменяет старый снимок.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    storages = [game.storage for game in Game.games.values()]
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+
+    with open(tmp_path, "wb") as file, gc_paused():
+        pickle.dump(
+            (SNAPSHOT_VERSION, storages),
+            file,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp_path, path)
+    return len(storages)
+
+
+def fill_defaults(obj):
+    """Дописывает в объект из старого снимка поля, появившиеся позже.
+
+    pickle восстанавливает dataclass через __dict__, минуя __init__,
+    поэтому новых полей у старых объектов нет вовсе.
+    """
+
+    for item in dataclasses.fields(obj):
+        if item.name in obj.__dict__:
+            continue
+        if item.default_factory is not dataclasses.MISSING:
+            setattr(obj, item.name, item.default_factory())
+        elif item.default is not dataclasses.MISSING:
+            setattr(obj, item.name, item.default)
+
+
+def migrate(storage: GameStorage) -> GameStorage:
+    """Приводит игру из снимка старой версии к текущей."""
+
+    if "moves" not in storage.__dict__:
+        # Порядок ходов до журнала не хранился - берётся порядок клеток
+        storage.moves = [
+            coordinate for coordinate, symbol in enumerate(storage.map)
+            if symbol is not None
+        ]
+        storage.seq = len(storage.moves)
+
+    if "is_rated" not in storage.__dict__:
+        storage.is_rated = storage.is_external_created
+
+    fill_defaults(storage)
+    player: PlayerStorage
+    for player in storage.players:
+        fill_defaults(player)
+
+    return storage
+
+
+def load_snapshot(path: Path) -> int:
+    """Восстанавливает игры из снимка, возвращает их количество."""
+
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+
+    with file, gc_paused():
+        version, storages = pickle.load(file)
+
+    if version > SNAPSHOT_VERSION:
+        logging.warning("Unsupported snapshot version %s, skipping", version)
+        return 0
+
+    storage: GameStorage
+    with gc_paused():
+        for storage in storages:
+            if version < SNAPSHOT_VERSION:
+                migrate(storage)
+            Game.register(Game(storage))
+
+    return len(storages)
+
+
+def install(path: Path | None):
+    """Загружает снимок при старте и сохраняет его при остановке сервера."""
+
+    if not path:
+        return
+
+    started_at = time.perf_counter()
+    count = load_snapshot(path)
+    logging.info(
+        "Restored %s games in %.3fs", count, time.perf_counter() - started_at
+    )
+
+    atexit.register(save_snapshot, path)
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from uuid import UUID
 
-from app.logic.enums import WinStatus
+from app.logic.enums import GameVariant, WinStatus
+from app.logic.ultimate import UltimateBoard
 
 
 @dataclass
@@ -12,6 +13,15 @@ class GameStorage:
     map: list[str | None]
     is_end: bool = False
     is_external_created: bool = False
+    # Игроки с платформы: результат идёт в рейтинг
+    is_rated: bool = False
+    seq: int = 0
+    version: int = 0
+    moves: list[int] = field(default_factory=list)
+    turn_time_limit: int | None = None
+    game_time_limit: int | None = None
+    variant: str = GameVariant.CLASSIC
+    ultimate: UltimateBoard | None = None
 
 
 @dataclass
@@ -20,3 +30,4 @@ class PlayerStorage:
     name: str
     symbol: str
     win_status: WinStatus = WinStatus.UNKNOWN
+    eliminated_at: int | None = None
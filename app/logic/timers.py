@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "is_cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], Any]):
+        self.deadline = deadline
+        self.callback = callback
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class TimerScheduler:
+    """Один планировщик таймеров на процесс.
+
+    Таймеры лежат в куче по дедлайну, отмена ленивая. На цикле событий
+    всегда висит ровно один call_at на ближайший дедлайн, поэтому
+    миллион взведённых таймеров - это миллион записей в куче, а не
+    миллион задач.
+    """
+
+    __instance = None
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, Timer]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._wakeup_at: float | None = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._wakeup_at = None
+        loop.call_soon_threadsafe(self._reschedule)
+
+    def unbind(self):
+        """Отвязывает от цикла, например закрытого после теста."""
+
+        if self._handle is not None:
+            self._handle.cancel()
+        self._loop = None
+        self._handle = None
+        self._wakeup_at = None
+
+    def schedule(self, delay: float, callback: Callable[[], Any]) -> Timer:
+        timer = Timer(time.monotonic() + delay, callback)
+
+        with self._lock:
+            heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+            is_earliest = self._heap[0][2] is timer
+
+        if is_earliest and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._reschedule)
+
+        return timer
+
+    def _reschedule(self):
+        with self._lock:
+            while self._heap and self._heap[0][2].is_cancelled:
+                heapq.heappop(self._heap)
+            deadline = self._heap[0][0] if self._heap else None
+
+        if deadline == self._wakeup_at:
+            return
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        self._wakeup_at = deadline
+        if deadline is None:
+            return
+
+        delay = max(deadline - time.monotonic(), 0)
+        self._handle = self._loop.call_at(self._loop.time() + delay, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._wakeup_at = None
+        now = time.monotonic()
+
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, timer = heapq.heappop(self._heap)
+                if not timer.is_cancelled:
+                    due.append(timer)
+
+        for timer in due:
+            try:
+                result = timer.callback()
+                if asyncio.iscoroutine(result):
+                    self._loop.create_task(result)
+            except Exception:
+                logging.exception("Timer callback failed")
+
+        self._reschedule()
+
+    def __len__(self):
+        return len(self._heap)
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = TimerScheduler()
+
+        return cls.__instance
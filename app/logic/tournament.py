@@ -0,0 +1,470 @@
+"""Турниры по швейцарской системе и на выбывание.
+
+Партии тура создаются пачкой через Game.create_game. Результаты приходят
+подписчиком шины событий (GameEnded); как только сыграны все партии
+тура, следующий тур создаётся сам, а подписчикам уходят уведомления.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from uuid import UUID, uuid4
+
+from app.consumers import encode_message
+from app.logic.enums import TournamentFormat, WinStatus
+from app.logic.events import GameEnded
+from app.logic.game import Game
+
+if TYPE_CHECKING:
+    from app.consumers import TournamentConsumer
+
+POINTS = {
+    WinStatus.WIN: 1.0,
+    WinStatus.DRAW: 0.5,
+    WinStatus.LOSE: 0.0,
+    WinStatus.UNKNOWN: 0.0,
+}
+BYE_POINTS = 1.0
+
+
+@dataclass(eq=False, slots=True)
+class Participant:
+    id: UUID
+    name: str
+    seed: int
+    score: float = 0.0
+    wins: int = 0
+    byes: int = 0
+    opponents: set[UUID] = field(default_factory=set)
+    is_eliminated: bool = False
+
+
+@dataclass(eq=False, slots=True)
+class Pairing:
+    players: tuple[Participant, Participant]
+    # Номер места в сетке: победители соседних мест встречаются дальше
+    slot: int = 0
+    game_id: UUID | None = None
+    rematches: int = 0
+    winner: Participant | None = None
+    is_done: bool = False
+
+
+def bracket_order(size: int) -> list[int]:
+    """Посев сетки size = 2^k: первый и второй номера встречаются в финале."""
+
+    order = [0]
+    while len(order) < size:
+        order = [
+            seed for position in order
+            for seed in (position, 2 * len(order) - 1 - position)
+        ]
+    return order
+
+
+class Tournament:
+    # Сколько следующих по рейтингу кандидатов смотреть, избегая повторной встречи
+    PAIRING_WINDOW = 16
+    # Ничьих подряд в сетке, после которых проходит сеяный выше
+    MAX_REMATCHES = 2
+    # Лимит хода по умолчанию, секунды: не успевший сходить проигрывает,
+    # и брошенная партия не держит весь тур
+    TURN_TIME_LIMIT = 60
+
+    def __init__(
+        self,
+        participants: list[Participant],
+        format: TournamentFormat = TournamentFormat.SWISS,
+        rounds: int | None = None,
+        game_options: dict | None = None,
+        tournament_id: UUID | None = None,
+    ):
+        if len(participants) < 2:
+            raise ValueError("В турнире должно быть хотя бы 2 участника")
+
+        if len({participant.id for participant in participants}) != len(participants):
+            raise ValueError("Участники повторяются")
+
+        self.id = tournament_id or uuid4()
+        self.format = format
+        self.participants = {participant.id: participant for participant in participants}
+        self.game_options = dict(game_options or {})
+        if self.game_options.get("turn_time_limit") is None:
+            self.game_options["turn_time_limit"] = self.TURN_TIME_LIMIT
+
+        bracket_rounds = math.ceil(math.log2(len(participants)))
+        if format == TournamentFormat.BRACKET:
+            self.rounds = bracket_rounds
+            size = 2 ** bracket_rounds
+            by_seed = sorted(participants, key=lambda participant: participant.seed)
+            self.bracket: list[Participant | None] = [
+                by_seed[seed] if seed < len(by_seed) else None
+                for seed in bracket_order(size)
+            ]
+        else:
+            self.rounds = rounds or bracket_rounds
+            self.bracket = []
+
+        self.round = 0
+        self.pairings: dict[UUID, Pairing] = {}
+        self.by_player: dict[UUID, Pairing] = {}
+        self.round_byes: list[Participant] = []
+        self.pending = 0
+        self.is_finished = False
+
+    def next_round(self) -> list[Pairing]:
+        """Составляет пары следующего тура; пустой список - турнир окончен."""
+
+        if self.format == TournamentFormat.BRACKET:
+            pairings, byes = self.pair_bracket()
+        elif self.round < self.rounds:
+            pairings, byes = self.pair_swiss()
+        else:
+            pairings, byes = [], []
+
+        if not pairings:
+            self.is_finished = True
+            self.pairings = {}
+            self.by_player = {}
+            self.round_byes = []
+            return []
+
+        self.round += 1
+        for participant in byes:
+            participant.byes += 1
+            participant.score += BYE_POINTS
+
+        self.pairings = {}
+        self.by_player = {
+            participant.id: pairing
+            for pairing in pairings
+            for participant in pairing.players
+        }
+        self.round_byes = byes
+        self.pending = len(pairings)
+        return pairings
+
+    def pair_swiss(self) -> tuple[list[Pairing], list[Participant]]:
+        """Один проход по отсортированной таблице.
+
+        Каждый берёт ближайшего свободного соперника, с которым ещё не
+        играл, среди следующих PAIRING_WINDOW; не нашлось - ближайшего.
+        """
+
+        ordered = sorted(
+            self.participants.values(),
+            key=lambda participant: (-participant.score, participant.seed),
+        )
+
+        byes = []
+        if len(ordered) % 2:
+            # Пропуск - самому слабому из тех, у кого его ещё не было
+            index = next(
+                (
+                    index for index in range(len(ordered) - 1, -1, -1)
+                    if not ordered[index].byes
+                ),
+                len(ordered) - 1,
+            )
+            byes.append(ordered.pop(index))
+
+        count = len(ordered)
+        is_used = bytearray(count)
+        pairings = []
+        for index, participant in enumerate(ordered):
+            if is_used[index]:
+                continue
+            is_used[index] = 1
+
+            first_free = None
+            chosen = None
+            scanned = 0
+            candidate = index + 1
+            while candidate < count and scanned < self.PAIRING_WINDOW:
+                if not is_used[candidate]:
+                    if first_free is None:
+                        first_free = candidate
+                    if ordered[candidate].id not in participant.opponents:
+                        chosen = candidate
+                        break
+                    scanned += 1
+                candidate += 1
+
+            if chosen is None:
+                chosen = first_free
+            is_used[chosen] = 1
+            pairings.append(Pairing((participant, ordered[chosen])))
+
+        return pairings, byes
+
+    def pair_bracket(self) -> tuple[list[Pairing], list[Participant]]:
+        if len(self.bracket) < 2:
+            return [], []
+
+        pairings = []
+        byes = []
+        next_bracket = []
+        for slot in range(0, len(self.bracket), 2):
+            first, second = self.bracket[slot], self.bracket[slot + 1]
+            if first is None or second is None:
+                # Пропуск проходит дальше без партии
+                advanced = first or second
+                if advanced is not None:
+                    byes.append(advanced)
+                next_bracket.append(advanced)
+                continue
+
+            pairings.append(Pairing((first, second), slot=slot // 2))
+            next_bracket.append(None)
+
+        self.bracket = next_bracket
+        return pairings, byes
+
+    def record(self, event: GameEnded) -> Pairing | None:
+        """Учитывает результат партии.
+
+        Возвращает пару, если в сетке нужна переигровка после ничьей.
+        """
+
+        pairing = self.pairings.pop(event.game_id, None)
+        if pairing is None or pairing.is_done:
+            return None
+
+        statuses = {player.id: player.win_status for player in event.players}
+        first, second = pairing.players
+
+        if self.format == TournamentFormat.BRACKET:
+            winner = next(
+                (
+                    participant for participant in pairing.players
+                    if statuses.get(participant.id) == WinStatus.WIN
+                ),
+                None,
+            )
+            if winner is None and pairing.rematches < self.MAX_REMATCHES:
+                pairing.rematches += 1
+                return pairing
+
+            winner = winner or min(pairing.players, key=lambda participant: participant.seed)
+            loser = second if winner is first else first
+            loser.is_eliminated = True
+            winner.wins += 1
+            winner.score += 1
+            pairing.winner = winner
+            self.bracket[pairing.slot] = winner
+        else:
+            for participant, opponent in ((first, second), (second, first)):
+                status = statuses.get(participant.id, WinStatus.UNKNOWN)
+                participant.score += POINTS[status]
+                participant.wins += status == WinStatus.WIN
+                participant.opponents.add(opponent.id)
+
+        pairing.is_done = True
+        self.pending -= 1
+        return None
+
+    def get_standings(self) -> list[Participant]:
+        """Очки, затем Бухгольц (сумма очков соперников), победы и посев."""
+
+        buchholz = self.get_buchholz()
+        return sorted(
+            self.participants.values(),
+            key=lambda participant: (
+                participant.is_eliminated,
+                -participant.score,
+                -buchholz[participant.id],
+                -participant.wins,
+                participant.seed,
+            ),
+        )
+
+    def get_buchholz(self) -> dict[UUID, float]:
+        participants = self.participants
+        return {
+            participant.id: sum(
+                participants[opponent_id].score
+                for opponent_id in participant.opponents
+            )
+            for participant in participants.values()
+        }
+
+    def get_player_notice(self, player_id: UUID) -> dict:
+        notice = {"tournament_id": self.id, "round": self.round}
+
+        pairing = self.by_player.get(player_id)
+        if pairing is not None and not pairing.is_done:
+            opponent = next(
+                participant for participant in pairing.players
+                if participant.id != player_id
+            )
+            notice["game_id"] = pairing.game_id
+            notice["opponent"] = {"id": opponent.id, "name": opponent.name}
+        elif any(participant.id == player_id for participant in self.round_byes):
+            notice["bye"] = True
+
+        return notice
+
+    def get_state(self, limit: int | None = None, offset: int = 0) -> dict:
+        buchholz = self.get_buchholz()
+        standings = self.get_standings()
+        end = None if limit is None else offset + limit
+        return {
+            "tournament_id": self.id,
+            "format": self.format,
+            "round": self.round,
+            "rounds": self.rounds,
+            "is_finished": self.is_finished,
+            "games_left": self.pending if not self.is_finished else 0,
+            "standings": [
+                {
+                    "position": position,
+                    "id": participant.id,
+                    "name": participant.name,
+                    "score": participant.score,
+                    "buchholz": buchholz[participant.id],
+                    "wins": participant.wins,
+                    "is_eliminated": participant.is_eliminated,
+                }
+                for position, participant in enumerate(
+                    standings[offset:end], start=offset + 1
+                )
+            ],
+        }
+
+
+class TournamentHub:
+    """Все турниры процесса и подписчики на их уведомления."""
+
+    # Результаты партий не должны теряться, поэтому очередь подписчика шины
+    # рассчитана на одновременное окончание всех партий крупного турнира
+    QUEUE_SIZE = 1 << 16
+    # Сколько верхних строк таблицы уходит в уведомлении об окончании
+    NOTICE_STANDINGS = 10
+    __instance = None
+
+    def __init__(self):
+        self.tournaments: dict[UUID, Tournament] = {}
+        self.games: dict[UUID, Tournament] = {}
+        # турнир -> игрок (None - наблюдатель) -> соединения
+        self.subscribers: dict[UUID, dict[UUID | None, set["TournamentConsumer"]]] = {}
+
+    def get_tournament(self, tournament_id: UUID) -> Tournament:
+        tournament = self.tournaments.get(tournament_id)
+        if tournament is None:
+            raise ValueError("Турнир не найден")
+        return tournament
+
+    def create(self, tournament: Tournament) -> Tournament:
+        # Неверные параметры партий обнаружатся на первой же из них,
+        # и турнир не останется зарегистрированным без партий
+        self.create_games(tournament, tournament.next_round())
+        self.tournaments[tournament.id] = tournament
+        return tournament
+
+    def create_games(self, tournament: Tournament, pairings: list[Pairing]):
+        for pairing in pairings:
+            first, second = pairing.players
+            game = Game.create_game(
+                player_ids=[first.id, second.id],
+                player_names=[first.name, second.name],
+                is_rated=True,
+                **tournament.game_options,
+            )
+            # Часы идут сразу: неявившийся проигрывает по лимиту хода,
+            # а не держит тур до IDLE_GAME_TTL
+            game.start_clock()
+            pairing.game_id = game.id
+            tournament.pairings[game.id] = pairing
+            self.games[game.id] = tournament
+
+    async def on_games_ended(self, events: list[GameEnded]):
+        """Обработчик шины событий: учитывает пачку результатов разом."""
+
+        completed: dict[UUID, Tournament] = {}
+        rematches: list[tuple[Tournament, Pairing]] = []
+        for event in events:
+            tournament = self.games.pop(event.game_id, None)
+            if tournament is None:
+                continue
+
+            pairing = tournament.record(event)
+            if pairing is not None:
+                rematches.append((tournament, pairing))
+            elif not tournament.pending:
+                completed[tournament.id] = tournament
+
+        for tournament, pairing in rematches:
+            self.create_games(tournament, [pairing])
+            await self.notify_players(tournament, pairing.players)
+
+        for tournament in completed.values():
+            await self.advance(tournament)
+
+    async def advance(self, tournament: Tournament):
+        pairings = tournament.next_round()
+        self.create_games(tournament, pairings)
+
+        if tournament.is_finished:
+            await self.notify_finished(tournament)
+        else:
+            await self.notify_round(tournament)
+
+    async def notify_round(self, tournament: Tournament):
+        subscribers = self.subscribers.get(tournament.id, {})
+        for player_id, consumers in list(subscribers.items()):
+            if player_id is None:
+                message = {
+                    "tournament_id": tournament.id,
+                    "round": tournament.round,
+                    "games": tournament.pending,
+                }
+            else:
+                message = tournament.get_player_notice(player_id)
+
+            for consumer in list(consumers):
+                await consumer.send_message(message, "round_started")
+
+    async def notify_players(
+        self, tournament: Tournament, participants: tuple[Participant, ...]
+    ):
+        subscribers = self.subscribers.get(tournament.id, {})
+        for participant in participants:
+            for consumer in list(subscribers.get(participant.id, ())):
+                await consumer.send_message(
+                    tournament.get_player_notice(participant.id), "round_started"
+                )
+
+    async def notify_finished(self, tournament: Tournament):
+        # Одно и то же сообщение всем - кодируется один раз
+        text = encode_message(
+            tournament.get_state(limit=self.NOTICE_STANDINGS), "tournament_finished"
+        )
+        for consumers in list(self.subscribers.get(tournament.id, {}).values()):
+            for consumer in list(consumers):
+                await consumer.send_text(text)
+
+    def subscribe(self, consumer: "TournamentConsumer"):
+        self.subscribers.setdefault(consumer.tournament_id, {}).setdefault(
+            consumer.player_id, set()
+        ).add(consumer)
+
+    def unsubscribe(self, consumer: "TournamentConsumer"):
+        subscribers = self.subscribers.get(consumer.tournament_id)
+        if subscribers is None:
+            return
+
+        consumers = subscribers.get(consumer.player_id)
+        if consumers is not None:
+            consumers.discard(consumer)
+            if not consumers:
+                del subscribers[consumer.player_id]
+        if not subscribers:
+            del self.subscribers[consumer.tournament_id]
+
+    @classmethod
+    def instance(cls):
+        """Возвращает разделяемый instance."""
+
+        if cls.__instance is None:
+            cls.__instance = TournamentHub()
+
+        return cls.__instance
@@ -0,0 +1,74 @@
+"""Движок "ультимативных" крестиков-ноликов.
+
+Поле - 3x3 малых досок 3x3, координата хода 0..80: board * 9 + cell.
+Ход в клетку cell отправляет соперника на малую доску с номером cell.
+Каждая малая доска хранится битовыми масками игроков, выигранные
+доски - маской метадоски, поэтому проверки хода не зависят от размера поля.
+"""
+from app.logic.enums import WinStatus
+
+CELLS = 9
+FULL = (1 << CELLS) - 1
+
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# Для каждой из 512 масок заранее известно, есть ли в ней линия
+IS_WINNING = tuple(
+    any(mask & line == line for line in WIN_MASKS)
+    for mask in range(1 << CELLS)
+)
+
+
+class UltimateBoard:
+    __slots__ = ("cells", "occupied", "won", "closed", "next_board")
+
+    def __init__(self, players_count: int = 2):
+        # cells[player][board] - клетки игрока на малой доске
+        self.cells = [[0] * CELLS for _ in range(players_count)]
+        self.occupied = [0] * CELLS
+        self.won = [0] * players_count
+        self.closed = 0
+        self.next_board: int | None = None
+
+    def check_move(self, coordinate: int) -> tuple[int, int]:
+        board, cell = divmod(coordinate, CELLS)
+
+        if self.closed >> board & 1:
+            raise ValueError("Доска уже сыграна")
+
+        if self.next_board is not None and board != self.next_board:
+            raise ValueError(f"Ходить нужно на доску {self.next_board}")
+
+        if self.occupied[board] >> cell & 1:
+            raise ValueError("Координата занята")
+
+        return board, cell
+
+    def play(self, player_index: int, coordinate: int):
+        board, cell = self.check_move(coordinate)
+        bit = 1 << cell
+
+        self.occupied[board] |= bit
+        self.cells[player_index][board] |= bit
+
+        if IS_WINNING[self.cells[player_index][board]]:
+            self.won[player_index] |= 1 << board
+            self.closed |= 1 << board
+        elif self.occupied[board] == FULL:
+            self.closed |= 1 << board
+
+        self.next_board = None if self.closed >> cell & 1 else cell
+
+    def get_win_status(self) -> WinStatus:
+        for won in self.won:
+            if IS_WINNING[won]:
+                return WinStatus.WIN
+
+        if self.closed == FULL:
+            return WinStatus.DRAW
+
+        return WinStatus.UNKNOWN
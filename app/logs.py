@@ -0,0 +1,130 @@
+"""Неблокирующий структурированный журнал.
+
+В цикле событий запись только кладётся в очередь; форматирует её в JSON
+и пишет фоновый поток QueueListener. Одинаковые записи в пределах окна
+схлопываются: следующая после окна несёт число пропущенных повторов.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", None) or {})
+
+        for name in ("suppressed", "dropped"):
+            value = getattr(record, name, 0)
+            if value:
+                entry[name] = value
+
+        if record.exc_info:
+            entry["traceback"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RepeatFilter(logging.Filter):
+    """Пропускает одну запись из одинаковых за window секунд."""
+
+    # Сколько ключей хранить, прежде чем выбросить устаревшие
+    MAX_KEYS = 1024
+
+    def __init__(self, window: float):
+        super().__init__()
+        self.window = window
+        # ключ -> [начало окна, пропущено повторов]
+        self.seen: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (
+            record.name,
+            record.levelno,
+            record.getMessage(),
+            record.exc_info and type(record.exc_info[1]),
+        )
+        now = time.monotonic()
+
+        with self.lock:
+            state = self.seen.get(key)
+            if state is not None and now - state[0] < self.window:
+                state[1] += 1
+                return False
+
+            record.suppressed = state[1] if state else 0
+            self.seen[key] = [now, 0]
+
+            if len(self.seen) > self.MAX_KEYS:
+                self.seen = {
+                    key: state for key, state in self.seen.items()
+                    if now - state[0] < self.window
+                }
+
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Не блокирует цикл при переполнении: запись отбрасывается и учитывается."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Очередь внутри процесса: форматирование и трейсбек - в фоновом потоке
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped = 0
+
+
+listener: QueueListener | None = None
+
+
+def install(
+    queue_size: int, repeat_window: float, stream: TextIO | None = None
+) -> QueueListener:
+    """Направляет корневой логгер в очередь с фоновой записью."""
+
+    global listener
+    if listener is not None:
+        return listener
+
+    log_queue = queue.Queue(queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RepeatFilter(repeat_window))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+    # httpx пишет INFO на каждый запрос к платформе
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return listener
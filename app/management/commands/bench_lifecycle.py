@@ -0,0 +1,188 @@
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+
+from app.hr_platform import api
+from app.hr_platform.simulator import PlatformSimulator
+from app.logic.events import EventBus
+
+
+class Command(BaseCommand):
+    help = "Прогоняет полный цикл внешних оценок против симулятора платформы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assessments", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.02)
+        parser.add_argument("--jitter", type=float, default=0.02)
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument(
+            "--finish-rate", type=float, default=0.1,
+            help="Доля оценок, завершаемых через external/finish",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        # Журналы, архив и рейтинг прогона - во временном каталоге: игры
+        # бенчмарка внешние и иначе попали бы в рабочую таблицу лидеров
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            with override_settings(
+                MOVE_LOG_DIR=directory / "move_logs",
+                RESULTS_ARCHIVE_PATH=directory / "games.ndjson",
+                RATINGS_PATH=directory / "ratings.ndjson",
+                SNAPSHOT_PATH=None,
+            ):
+                asyncio.run(self.run(**options))
+
+    async def run(
+        self,
+        assessments: int,
+        concurrency: int,
+        latency: float,
+        jitter: float,
+        failure_rate: float,
+        finish_rate: float,
+        seed: int | None,
+        **options,
+    ):
+        from djangoProject.asgi import application
+
+        simulator = PlatformSimulator(latency, jitter, failure_rate, seed)
+        api.transport = simulator
+        rng = random.Random(seed)
+
+        client = AsyncClient(raise_request_exception=False)
+        meta = await client.get("/api/external/meta")
+        params = {
+            key: param.get("default")
+            for key, param in meta.json()["gameTypes"]["solo"]["params"].items()
+        }
+
+        ended_at: dict[UUID, float] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_assessment():
+            async with semaphore:
+                assessment_id = uuid4()
+                ended_at[assessment_id] = await self.play(
+                    application, client, assessment_id, params,
+                    is_finished_early=rng.random() < finish_rate,
+                    rng=rng,
+                )
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(run_assessment() for _ in range(assessments)))
+        elapsed = time.perf_counter() - started_at
+
+        # Результаты уходят через шину событий, ждём её подписчиков
+        await EventBus.instance().join()
+
+        lags = [
+            simulator.results[assessment_id][0] - end
+            for assessment_id, end in ended_at.items()
+            if assessment_id in simulator.results
+        ]
+        lost = assessments - len(lags)
+
+        self.stdout.write(
+            f"assessments={assessments} time={elapsed:.2f}s "
+            f"throughput={assessments / elapsed:.1f}/s "
+            f"platform_requests={simulator.requests} "
+            f"platform_failures={simulator.failures} lost_results={lost}"
+        )
+        if lags:
+            lags.sort()
+            self.stdout.write(
+                f"result_lag_ms p50={statistics.median(lags) * 1000:.1f} "
+                f"p99={lags[int(len(lags) * 0.99) - 1] * 1000:.1f} "
+                f"max={lags[-1] * 1000:.1f}"
+            )
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {settings.EXTERNAL_API_KEY}"}
+
+    async def play(
+        self,
+        application,
+        client: AsyncClient,
+        assessment_id: UUID,
+        params: dict,
+        is_finished_early: bool,
+        rng: random.Random,
+    ) -> float:
+        """Создаёт оценку, играет её по вебсокетам и возвращает время конца."""
+
+        players = [
+            {"uid": str(uuid4()), "name": f"Bench {role}", "role": role}
+            for role in ("player_1", "player_2")
+        ]
+        response = await client.post(
+            "/api/external/create",
+            {"assessment_id": str(assessment_id), "players": players, "params": params},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        if response.status_code != 200:
+            raise CommandError(f"external/create: {response.status_code}")
+
+        sockets = {}
+        turn = None
+        for player in players:
+            communicator = WebsocketCommunicator(
+                application, f"/api/connect/{assessment_id}/{player['uid']}"
+            )
+            await communicator.connect()
+            sync = json.loads(await communicator.receive_from())
+            sockets[player["uid"]] = communicator
+            if sync["data"]["player"]["is_turn"]:
+                turn = player["uid"]
+
+        free = list(range(9))
+        rng.shuffle(free)
+        moves_left = rng.randint(1, 4) if is_finished_early else len(free)
+
+        ended_at = None
+        while ended_at is None:
+            if not moves_left:
+                ended_at = time.monotonic()
+                await client.post(
+                    f"/api/external/finish/{assessment_id}",
+                    headers=self.headers,
+                )
+                break
+
+            moves_left -= 1
+            sent_at = time.monotonic()
+            await sockets[turn].send_to(text_data=json.dumps(
+                {"action": "attack", "data": {"coordinate": free.pop()}}
+            ))
+
+            # start_turn и end_game приходят сопернику, ждём их у него
+            opponent = next(uid for uid in sockets if uid != turn)
+            while True:
+                frame = json.loads(
+                    await sockets[opponent].receive_from(timeout=10)
+                )
+                if frame["action"] == "end_game":
+                    ended_at = sent_at
+                    break
+                if frame["action"] == "start_turn":
+                    turn = opponent
+                    break
+
+        for communicator in sockets.values():
+            await communicator.disconnect()
+
+        return ended_at
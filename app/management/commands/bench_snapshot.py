@@ -0,0 +1,42 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from app.logic.game import Game
+from app.logic.snapshot import load_snapshot, save_snapshot
+
+
+class Command(BaseCommand):
+    help = "Замеряет время сохранения и загрузки снимка живых игр"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--games", type=int, default=100_000)
+
+    def handle(self, *args, games: int, **options):
+        Game.games.clear()
+        for _ in range(games):
+            game = Game.create_game()
+            for coordinate in random.sample(range(9), random.randint(0, 4)):
+                game.attack_point(coordinate, game.current_player.symbol)
+                game.storage.current_player_id = game.get_next_player().id
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "games.snapshot"
+
+            started_at = time.perf_counter()
+            save_snapshot(path)
+            save_time = time.perf_counter() - started_at
+            size = path.stat().st_size
+
+            Game.games.clear()
+            started_at = time.perf_counter()
+            count = load_snapshot(path)
+            load_time = time.perf_counter() - started_at
+
+        self.stdout.write(
+            f"games={count} size={size / 2 ** 20:.1f}MiB "
+            f"save={save_time:.3f}s load={load_time:.3f}s"
+        )
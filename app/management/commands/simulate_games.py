@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app.logic import batch
+
+
+class Command(BaseCommand):
+    help = "Массово играет случайные партии и сверяет результаты с Game"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--games", type=int, default=1_000_000)
+        parser.add_argument("--check", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, games: int, check: int, seed: int | None, **options):
+        started_at = time.perf_counter()
+        boards, status = batch.simulate(games, seed=seed)
+        elapsed = time.perf_counter() - started_at
+
+        counts = np.bincount(status, minlength=4)
+        self.stdout.write(
+            f"games={games} time={elapsed:.3f}s "
+            f"rate={games / elapsed:,.0f}/s "
+            f"first={counts[1]} second={counts[2]} draw={counts[3]} "
+            f"unfinished={counts[0]}"
+        )
+
+        # Сверяются и партии, оборванные на каждом ходу, чтобы проверить
+        # не только финальные доски
+        checked = 0
+        for moves in range(1, 10):
+            boards, status = batch.simulate(check, seed=seed, max_moves=moves)
+            mismatches = batch.cross_check(boards, status)
+            if mismatches:
+                raise CommandError(
+                    f"{mismatches} of {check} boards after {moves} moves "
+                    f"disagree with Game"
+                )
+            checked += check
+
+        self.stdout.write(f"checked={checked} mismatches=0")
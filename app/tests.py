@@ -1,3 +1,799 @@
-from django.test import TestCase
+import asyncio
+import json
+import pickle
+import tempfile
+from pathlib import Path
+from unittest import mock
+from uuid import UUID, uuid4
+
+import httpx
+import jwt
+import numpy as np
+from channels.testing import WebsocketCommunicator
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from app import hr_platform
+from app.auth import JWKeyCache
+from app.consumers import DashboardConsumer, GameConsumer, SpectatorConsumer
+
+from app.logic import batch
+from app.logic.actor import GameActor
+from app.logic.enums import GameVariant, WinStatus
+from app.logic.events import GameEnded, PlayerQuit, PlayerResult
+from app.logic.game import MAX_BOARD_SIZE, Game
+from app.logic.matchmaking import Matchmaker, Ticket
+from app.logic.move_log import replay
+from app.logic.rating import DEFAULT_RATING, RatingBook
+from app.logic.snapshot import SNAPSHOT_VERSION, load_snapshot, save_snapshot
+from app.logic.storages import GameStorage, PlayerStorage
+from app.logic.timers import TimerScheduler
+from app.logic.tournament import Participant, Tournament, TournamentHub
+from app.logic.ultimate import UltimateBoard
+
+
+# Журналы ходов, архив и рейтинг тестов - во временном каталоге, а не
+# в рабочих путях из настроек
+scratch = tempfile.TemporaryDirectory()
+scratch_settings = override_settings(
+    MOVE_LOG_DIR=Path(scratch.name) / "move_logs",
+    RESULTS_ARCHIVE_PATH=Path(scratch.name) / "games.ndjson",
+    RATINGS_PATH=Path(scratch.name) / "ratings.ndjson",
+    SNAPSHOT_PATH=None,
+)
+
+
+def setUpModule():
+    scratch_settings.enable()
+
+
+def tearDownModule():
+    scratch_settings.disable()
+    scratch.cleanup()
+
+
+def make_scratch_dir() -> Path:
+    return Path(tempfile.mkdtemp(dir=scratch.name))
+
+
+class GamesTestCase(SimpleTestCase):
+    """Очищает реестр игр после каждого теста."""
+
+    def tearDown(self):
+        for game_id in list(Game.games):
+            Game.unregister(game_id)
+        TimerScheduler.instance().unbind()
+
+
+class SnapshotTests(GamesTestCase):
+    def test_old_version_is_migrated(self):
+        players = [
+            PlayerStorage(id=uuid4(), name=f"Player {symbol}", symbol=symbol)
+            for symbol in "XO"
+        ]
+        storage = GameStorage(
+            id=uuid4(),
+            players=players,
+            current_player_id=players[0].id,
+            map=["X", None, None, None, "O", None, None, None, None],
+        )
+        # Так выглядел объект до появления журнала ходов и лимитов
+        for name in (
+            "seq", "moves", "turn_time_limit", "variant", "ultimate", "is_rated"
+        ):
+            del storage.__dict__[name]
+        for player in players:
+            del player.__dict__["eliminated_at"]
+
+        path = make_scratch_dir() / "snapshot.pickle"
+        path.write_bytes(pickle.dumps((1, [storage])))
+
+        self.assertEqual(load_snapshot(path), 1)
+        game = Game.games[storage.id]
+        self.assertEqual(game.storage.moves, [0, 4])
+        self.assertEqual(game.storage.seq, 2)
+        self.assertIsNone(game.storage.turn_time_limit)
+        self.assertFalse(game.storage.is_rated)
+        self.assertIsNone(game.players[1].storage.eliminated_at)
+        self.assertEqual(game.current_player.symbol, "X")
+
+    def test_newer_version_is_skipped(self):
+        path = make_scratch_dir() / "snapshot.pickle"
+        path.write_bytes(pickle.dumps((SNAPSHOT_VERSION + 1, [])))
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(load_snapshot(path), 0)
+
+
+class TimerTests(GamesTestCase):
+    async def test_move_queued_before_timeout_wins_the_race(self):
+        game = Game.create_game(turn_time_limit=5)
+        game.start_clock()
+        player = game.current_player
+        timeout = game.turn_timer.callback
+
+        # Ход уже в очереди игры, когда срабатывает таймер
+        move = game.submit(lambda: player.attack({"coordinate": 4}))
+        await asyncio.gather(move, timeout())
+        self.assertFalse(game.is_end)
+        self.assertEqual(player.storage.win_status, WinStatus.UNKNOWN)
+
+        opponent = game.current_player
+        await game.turn_timer.callback()
+        self.assertTrue(game.is_end)
+        self.assertEqual(opponent.storage.win_status, WinStatus.LOSE)
+        self.assertEqual(player.storage.win_status, WinStatus.WIN)
+
+    async def test_restored_ended_game_is_unregistered(self):
+        TimerScheduler.instance().bind(asyncio.get_running_loop())
+        game = Game.create_game()
+        await game.finish_game()
+
+        path = make_scratch_dir() / "snapshot.pickle"
+        save_snapshot(path)
+        Game.unregister(game.id)
+
+        with self.settings(ENDED_GAME_TTL=0):
+            self.assertEqual(load_snapshot(path), 1)
+        self.assertIn(game.id, Game.games)
+        await asyncio.sleep(0.05)
+        self.assertNotIn(game.id, Game.games)
+
+
+class CreateGameTests(GamesTestCase):
+    def test_board_size_bounds(self):
+        game = Game.create_game(board_size=MAX_BOARD_SIZE)
+        self.assertEqual(len(game.map), MAX_BOARD_SIZE ** 2)
+
+        for board_size in (2, MAX_BOARD_SIZE + 1, 10 ** 6):
+            with self.assertRaises(ValueError):
+                Game.create_game(board_size=board_size)
+
+        participants = [
+            Participant(id=uuid4(), name=f"P{seed}", seed=seed)
+            for seed in range(2)
+        ]
+        tournament = Tournament(participants, game_options={"board_size": 10 ** 6})
+        hub = TournamentHub()
+        with self.assertRaises(ValueError):
+            hub.create(tournament)
+        self.assertEqual(hub.tournaments, {})
+
+
+class ActorTests(SimpleTestCase):
+    async def test_commands_and_sends_keep_order(self):
+        actor = GameActor()
+        log = []
+
+        def command(name: str, error: Exception | None = None):
+            async def run():
+                log.append(name)
+                await asyncio.sleep(0)
+                await actor.deliver(record(f"send {name}"))
+                if error is not None:
+                    raise error
+                return name
+            return run
+
+        async def record(name: str):
+            log.append(name)
+
+        first = actor.submit(command("a"))
+        failed = actor.submit(command("b", ValueError("b")))
+        last = actor.submit(command("c"))
+
+        self.assertEqual(await last, "c")
+        self.assertEqual(first.result(), "a")
+        # Ошибка одной команды достаётся только её future
+        self.assertIsInstance(failed.exception(), ValueError)
+        # Отправки пачки уходят после всех её команд, в порядке отправки
+        self.assertEqual(
+            log, ["a", "b", "c", "send a", "send b", "send c"]
+        )
+
+    async def test_pending_commands_fail_when_actor_is_cancelled(self):
+        actor = GameActor()
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        running = actor.submit(hang)
+        await started.wait()
+        queued = actor.submit(hang)
+        actor._task.cancel()
+
+        for future in (running, queued):
+            with self.assertRaisesMessage(RuntimeError, "Команда игры не выполнена"):
+                await future
+
+
+class ReplayTests(GamesTestCase):
+    async def play(self, game: Game, coordinates: list[int]):
+        for coordinate in coordinates:
+            await game.current_player.attack({"coordinate": coordinate})
+
+    async def test_replay_restores_any_move(self):
+        game = Game.create_game()
+        await self.play(game, [0, 3, 1, 4, 2])
+
+        self.assertEqual(replay(game).map, game.map)
+        self.assertTrue(replay(game).is_end)
+
+        replayed = replay(game, seq=3)
+        self.assertEqual(
+            [cell for cell, symbol in enumerate(replayed.map) if symbol],
+            [0, 1, 3],
+        )
+        # Первый ход случайный: ходит тот, кто ставил вторым
+        self.assertEqual(replayed.current_player.symbol, replayed.map[3])
+        self.assertNotIn(replayed, Game.games.values())
+
+    async def test_move_id_resend_and_validation(self):
+        game = Game.create_game()
+        player = game.current_player
+        await player.attack({"move_id": "a", "coordinate": 4})
+        await game.current_player.attack({"move_id": "a", "coordinate": 0})
+        await player.attack({"move_id": "a", "coordinate": 4})
+        self.assertEqual(game.storage.seq, 2)
+
+        for data in (
+            {"move_id": [1], "coordinate": 1},
+            {"coordinate": "1"},
+            {"coordinate": True},
+            None,
+        ):
+            with self.assertRaises(ValueError):
+                await player.attack(data)
+
+
+class UltimateTests(GamesTestCase):
+    @staticmethod
+    def play_free(board: UltimateBoard, moves: list[tuple[int, int]]):
+        """Ходы без правила отправки - проверяются только доски."""
+
+        for player_index, coordinate in moves:
+            board.next_board = None
+            board.play(player_index, coordinate)
+
+    def test_move_sends_opponent_to_board(self):
+        board = UltimateBoard()
+        board.play(0, 4)
+        self.assertEqual(board.next_board, 4)
+
+        with self.assertRaises(ValueError):
+            board.play(1, 5 * 9)
+
+        board.play(1, 4 * 9 + 4)
+        with self.assertRaises(ValueError):
+            board.play(0, 4 * 9 + 4)
+
+    def test_closed_board_gives_free_move(self):
+        board = UltimateBoard()
+        self.play_free(board, [(0, 0), (1, 9), (0, 1), (1, 10), (0, 2)])
+        self.assertEqual(board.closed, 1)
+
+        # Ход в клетку 0 отправил бы на сыгранную доску 0
+        board.next_board = 3
+        board.play(1, 3 * 9)
+        self.assertIsNone(board.next_board)
+        with self.assertRaises(ValueError):
+            board.play(0, 5)
+
+    def test_meta_board_win(self):
+        board = UltimateBoard()
+        moves = []
+        for small in (0, 1, 2):
+            moves += [(0, small * 9 + cell) for cell in (0, 1, 2)]
+            moves.append((1, 40 + small))
+        self.play_free(board, moves[:-1])
+        self.assertEqual(board.get_win_status(), WinStatus.WIN)
+        self.assertEqual(board.won, [0b111, 0])
+
+    async def test_game_reports_next_board(self):
+        game = Game.create_game(variant=GameVariant.ULTIMATE)
+        self.assertEqual(len(game.map), 81)
+
+        await game.current_player.attack({"coordinate": 7})
+        self.assertEqual(game.next_board, 7)
+        with self.assertRaises(ValueError):
+            await game.current_player.attack({"coordinate": 0})
+
+
+class TournamentTests(GamesTestCase):
+    @staticmethod
+    def get_result(pairing) -> GameEnded:
+        """Партия, в которой выигрывает сеяный выше."""
+
+        winner = min(pairing.players, key=lambda participant: participant.seed)
+        return GameEnded(
+            game_id=pairing.game_id,
+            players=tuple(
+                PlayerResult(
+                    id=participant.id,
+                    name=participant.name,
+                    symbol="X",
+                    win_status=WinStatus.WIN if participant is winner else WinStatus.LOSE,
+                    position=0 if participant is winner else 1,
+                )
+                for participant in pairing.players
+            ),
+            map=(),
+            is_external_created=False,
+            is_rated=True,
+        )
+
+    async def test_swiss_pairs_everyone_without_rematches(self):
+        participants = [
+            Participant(id=uuid4(), name=f"P{seed}", seed=seed)
+            for seed in range(9)
+        ]
+        tournament = Tournament(participants, rounds=4)
+        hub = TournamentHub()
+        hub.create(tournament)
+
+        met = set()
+        byes = set()
+        while not tournament.is_finished:
+            pairings = list(tournament.pairings.values())
+            self.assertEqual(len(pairings), 4)
+
+            paired = [participant.id for pairing in pairings for participant in pairing.players]
+            self.assertEqual(len(set(paired)), 8)
+            (bye,) = tournament.round_byes
+            self.assertNotIn(bye.id, paired)
+            self.assertNotIn(bye.id, byes)
+            byes.add(bye.id)
+
+            for pairing in pairings:
+                key = frozenset(participant.id for participant in pairing.players)
+                self.assertNotIn(key, met)
+                met.add(key)
+
+            await hub.on_games_ended([self.get_result(pairing) for pairing in pairings])
+
+        self.assertEqual(tournament.round, 4)
+        self.assertEqual(tournament.get_standings()[0].seed, 0)
+        self.assertEqual(
+            sum(participant.score for participant in participants), 4 * 4 + 4
+        )
+
+    async def test_no_show_forfeits_on_turn_limit(self):
+        participants = [
+            Participant(id=uuid4(), name=f"P{seed}", seed=seed)
+            for seed in range(2)
+        ]
+        tournament = Tournament(participants, game_options={"turn_time_limit": None})
+        TournamentHub().create(tournament)
+
+        (game_id,) = tournament.pairings
+        game = Game.games[game_id]
+        self.assertEqual(game.storage.turn_time_limit, Tournament.TURN_TIME_LIMIT)
+        # Никто не подключился, а ход уже на часах
+        self.assertTrue(game.is_started)
+        absent = game.current_player
+        await game.turn_timer.callback()
+        self.assertTrue(game.is_end)
+        self.assertEqual(absent.storage.win_status, WinStatus.LOSE)
+
+
+class RatingTests(SimpleTestCase):
+    @staticmethod
+    def get_event(winner: UUID, loser: UUID, is_rated: bool = True) -> GameEnded:
+        return GameEnded(
+            game_id=uuid4(),
+            players=tuple(
+                PlayerResult(
+                    id=player_id,
+                    name=str(player_id),
+                    symbol=symbol,
+                    win_status=status,
+                    position=position,
+                )
+                for player_id, symbol, status, position in (
+                    (winner, "X", WinStatus.WIN, 0),
+                    (loser, "O", WinStatus.LOSE, 1),
+                )
+            ),
+            map=(),
+            is_external_created=is_rated,
+            is_rated=is_rated,
+        )
+
+    def test_expected_score_is_symmetric(self):
+        expected = RatingBook.get_expected(1700, 1500)
+        self.assertAlmostEqual(expected + RatingBook.get_expected(1500, 1700), 1)
+        self.assertGreater(expected, 0.5)
+        self.assertEqual(RatingBook.get_expected(1500, 1500), 0.5)
+
+    def test_winner_gains_and_leaderboard_pages(self):
+        book = RatingBook()
+        first, second, third = uuid4(), uuid4(), uuid4()
+        book.on_games_ended([
+            self.get_event(first, second),
+            self.get_event(uuid4(), uuid4(), is_rated=False),
+        ])
+
+        winner = book.get_player_state(first)
+        self.assertEqual(winner["rating"], DEFAULT_RATING + RatingBook.K_FACTOR / 2)
+        self.assertEqual((winner["rank"], winner["wins"], winner["games"]), (1, 1, 1))
+        self.assertEqual(book.get_player_state(second)["rank"], 2)
+
+        book.on_games_ended([self.get_event(third, second)])
+        board = book.get_leaderboard(limit=2)
+        self.assertEqual(board["total"], 3)
+        self.assertEqual(
+            [row["id"] for row in board["results"]], [first, third]
+        )
+        self.assertGreater(
+            board["results"][0]["rating"], board["results"][1]["rating"]
+        )
+        (last,) = book.get_leaderboard(limit=2, offset=2)["results"]
+        self.assertEqual((last["id"], last["rank"]), (second, 3))
+
+        with self.assertRaises(ValueError):
+            book.get_player_state(uuid4())
+
+    def test_load_skips_corrupt_tail(self):
+        path = make_scratch_dir() / "ratings.ndjson"
+        book = RatingBook(path)
+        first, second = uuid4(), uuid4()
+        book.on_games_ended([self.get_event(first, second)])
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('{"id": "')
+
+        with self.assertLogs(level="WARNING"):
+            loaded = RatingBook(path)
+        self.assertEqual(
+            loaded.get_player_state(first), book.get_player_state(first)
+        )
+        self.assertTrue(path.read_text(encoding="utf-8").endswith("}\n"))
+
+
+class FakeConsumer:
+    async def on_matched(self, game, player):
+        pass
+
+
+class MatchmakingTests(SimpleTestCase):
+    def setUp(self):
+        self.matchmaker = Matchmaker()
+        self.now = 1000.0
+
+    def enqueue(self, rating=None, symbol=None, waited=0.0) -> Ticket:
+        ticket = Ticket(FakeConsumer(), rating=rating, symbol=symbol)
+        self.matchmaker.enqueue(ticket, now=self.now - waited)
+        return ticket
+
+    async def test_cancel_counts_only_queued_tickets(self):
+        ticket = Ticket(FakeConsumer(), symbol="Z")
+        with self.assertRaises(ValueError):
+            self.matchmaker.enqueue(ticket)
+
+        self.matchmaker.cancel(ticket)
+        self.matchmaker.cancel(ticket)
+        self.assertEqual(self.matchmaker.size, 0)
+
+    async def test_band_widens_with_wait(self):
+        interval = Matchmaker.WIDEN_INTERVAL
+        first = self.enqueue(rating=199, symbol="X")
+        second = self.enqueue(rating=200, symbol="O")
+        self.assertEqual(self.matchmaker.pair(now=self.now), [])
+
+        self.assertEqual(
+            self.matchmaker.pair(now=self.now + interval), [(first, second)]
+        )
+        self.assertEqual(self.matchmaker.size, 0)
+
+    async def test_nearest_rating_and_unrated_after_wait(self):
+        interval = Matchmaker.WIDEN_INTERVAL
+        ticket = self.enqueue(rating=1000, waited=3 * interval)
+        far = self.enqueue(rating=1290)
+        near = self.enqueue(rating=950)
+        unrated = self.enqueue(symbol="X", waited=5 * interval)
+        self.enqueue(rating=2500, symbol="X")
+
+        pairs = self.matchmaker.pair(now=self.now)
+        self.assertIn((ticket, near), pairs)
+        self.assertIn((unrated, far), pairs)
+        self.assertEqual(self.matchmaker.size, 1)
+
+    async def test_cancelled_tickets_are_not_paired(self):
+        interval = Matchmaker.WIDEN_INTERVAL
+        tickets = [self.enqueue(rating=1000 + number) for number in range(10)]
+        for ticket in tickets[:9]:
+            self.matchmaker.cancel(ticket)
+        late = self.enqueue(rating=1500, symbol="O")
+
+        self.assertEqual(self.matchmaker.pair(now=self.now), [])
+        self.assertEqual(self.matchmaker.pair(now=self.now + interval), [])
+        self.assertEqual(
+            self.matchmaker.pair(now=self.now + 5 * interval), [(tickets[9], late)]
+        )
+        self.assertEqual(self.matchmaker.size, 0)
+        self.assertEqual(len(self.matchmaker._queues), 0)
+
+
+class BatchTests(SimpleTestCase):
+    def test_evaluate_matches_game(self):
+        for max_moves in (9, 5):
+            boards, status = batch.simulate(2000, seed=34, max_moves=max_moves)
+            self.assertEqual(batch.cross_check(boards, status), 0)
+
+        _, status = batch.simulate(2000, seed=34)
+        self.assertEqual(
+            set(np.unique(status).tolist()), {1, 2, batch.DRAW}
+        )
+
+    def test_known_boards(self):
+        boards = np.array([
+            [1, 1, 1, 2, 2, 0, 0, 0, 0],
+            [2, 1, 0, 2, 1, 0, 2, 0, 1],
+            [1, 2, 1, 1, 2, 2, 2, 1, 1],
+            [1, 2, 0, 0, 0, 0, 0, 0, 0],
+        ], dtype=np.int8)
+        self.assertEqual(
+            batch.evaluate(boards).tolist(),
+            [1, 2, batch.DRAW, batch.IN_PROGRESS],
+        )
+
+
+class DashboardTests(GamesTestCase):
+    async def connect(self, query: str = "") -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(
+            DashboardConsumer.as_asgi(), f"/api/dashboard{query}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_player_token_is_not_enough(self):
+        game = Game.create_game()
+        communicator = await self.connect()
+
+        await communicator.send_json_to({"action": "auth", "data": {"token": "Bearer player"}})
+        self.assertFalse((await communicator.receive_json_from())["is_success"])
+        await communicator.send_json_to({"action": "subscribe"})
+        self.assertFalse((await communicator.receive_json_from())["is_success"])
+
+        await communicator.send_json_to({
+            "action": "auth", "data": {"token": f"Bearer {settings.EXTERNAL_API_KEY}"}
+        })
+        self.assertTrue((await communicator.receive_json_from())["is_success"])
+        await communicator.send_json_to({"action": "subscribe"})
+        (state,) = (await communicator.receive_json_from())["data"]["games"]
+        self.assertEqual(state["game_id"], str(game.id))
+        await communicator.disconnect()
+
+    async def test_handshake_key(self):
+        communicator = WebsocketCommunicator(
+            DashboardConsumer.as_asgi(), "/api/dashboard?token=player"
+        )
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+        communicator = await self.connect(f"?token={settings.EXTERNAL_API_KEY}")
+        await communicator.send_json_to({"action": "subscribe"})
+        self.assertTrue((await communicator.receive_json_from())["is_success"])
+        await communicator.disconnect()
+
+
+class PlatformRetryTests(SimpleTestCase):
+    async def test_results_survive_long_outage(self):
+        failures = 10
+        sent = []
+
+        def handle(request: httpx.Request) -> httpx.Response:
+            nonlocal failures
+            if failures:
+                failures -= 1
+                return httpx.Response(503)
+            sent.append(request.url.path.rsplit("/", 1)[-1])
+            return httpx.Response(200)
+
+        game_id = uuid4()
+        player = PlayerResult(
+            id=uuid4(), name="A", symbol="X", win_status=WinStatus.WIN, position=0
+        )
+        events = [
+            PlayerQuit(game_id=game_id, player_id=uuid4(), is_external_created=True),
+            GameEnded(
+                game_id=game_id,
+                players=(player,),
+                map=(),
+                is_external_created=True,
+                is_rated=True,
+            ),
+        ]
+
+        with (
+            mock.patch.object(hr_platform.api, "transport", httpx.MockTransport(handle)),
+            mock.patch.object(hr_platform.api, "RETRY_DELAY", 0),
+            self.assertLogs(level="WARNING"),
+        ):
+            await hr_platform.send_events(events)
+            await hr_platform.join()
+
+        self.assertEqual(sent, ["quit", "add"])
+        self.assertEqual(hr_platform.api.retrying, {})
+
+
+class ConsumerTests(GamesTestCase):
+    async def connect(self, game: Game, player_id: UUID | None, query: str = ""):
+        path = f"/api/connect/{game.id}" + (f"/{player_id}" if player_id else "")
+        communicator = WebsocketCommunicator(GameConsumer.as_asgi(), path + query)
+        communicator.scope["url_route"] = {
+            "kwargs": {"game_id": game.id, "player_id": player_id}
+        }
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    @staticmethod
+    async def receive_until(communicator, predicate) -> dict:
+        while True:
+            message = await communicator.receive_json_from()
+            if predicate(message):
+                return message
+
+    async def test_unknown_action_is_client_error(self):
+        game = Game.create_game()
+        communicator = await self.connect(game, game.players[0].id)
+
+        with self.assertNoLogs("app.consumers", level="ERROR"):
+            for data in ({"action": "nope"}, {"data": 1}, {"action": ["attack"]}):
+                await communicator.send_json_to(data)
+                error = await self.receive_until(
+                    communicator, lambda message: not message["is_success"]
+                )
+                self.assertEqual(error["data"]["detail"], "Неизвестное действие")
+
+        await communicator.disconnect()
+
+    async def test_batched_frame_carries_ack_and_attack(self):
+        game = Game.create_game()
+        player = game.current_player
+        communicator = await self.connect(game, player.id, "?batch=1")
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to(
+            {"action": "attack", "data": {"move_id": "m1", "coordinate": 4}}
+        )
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame["action"], "batch")
+        frames = {inner["action"]: inner["data"] for inner in frame["data"]}
+        self.assertEqual(frames["ack"], {"move_id": "m1", "seq": 1})
+        self.assertIn("attack", frames)
+        self.assertEqual(game.map[4], player.symbol)
+
+        await communicator.disconnect()
+
+    async def watch(self, game: Game) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(
+            SpectatorConsumer.as_asgi(), f"/api/watch/{game.id}"
+        )
+        communicator.scope["url_route"] = {"kwargs": {"game_id": game.id}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    @staticmethod
+    async def receive_until_closed(communicator) -> list[str]:
+        actions = []
+        while True:
+            output = await communicator.receive_output(timeout=2)
+            if output["type"] == "websocket.close":
+                return actions
+            actions.append(json.loads(output["text"])["action"])
+
+    async def test_spectators_are_closed_when_game_ends(self):
+        game = Game.create_game()
+        communicator = await self.watch(game)
+        self.assertEqual(
+            (await communicator.receive_json_from())["action"], "syncronize"
+        )
+
+        await game.submit(game.finish_game)
+        self.assertEqual(
+            await self.receive_until_closed(communicator), ["end_game"]
+        )
+
+        late = await self.watch(game)
+        self.assertEqual(await self.receive_until_closed(late), ["syncronize"])
+
+    async def test_spectators_are_closed_when_game_is_unregistered(self):
+        game = Game.create_game()
+        communicator = await self.watch(game)
+        self.assertEqual(
+            (await communicator.receive_json_from())["action"], "syncronize"
+        )
+
+        Game.unregister(game.id)
+        self.assertEqual(
+            await self.receive_until_closed(communicator), ["game_closed"]
+        )
+
+        # Игру сняли раньше, чем наблюдатель получил снимок
+        game = Game.create_game()
+        communicator = await self.watch(game)
+        Game.unregister(game.id)
+        actions = await self.receive_until_closed(communicator)
+        self.assertIn(actions, (["root"], ["game_closed"]))
+
+
+class HandshakeTests(GamesTestCase):
+    """Токен игрока в рукопожатии: ?token= или Sec-WebSocket-Protocol."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_key = cls.private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        keys = mock.Mock(get_key_by_id=lambda key_id: public_key)
+        cls.keys_patch = mock.patch.object(JWKeyCache, "instance", return_value=keys)
+        cls.keys_patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.keys_patch.stop()
+        super().tearDownClass()
+
+    def make_token(self, player_id: UUID) -> str:
+        return jwt.encode(
+            {
+                "sub": str(player_id),
+                "resource_access": {},
+                "given_name": "Test",
+                "family_name": "Player",
+            },
+            self.private_key,
+            algorithm="RS256",
+            headers={"kid": "test"},
+        )
+
+    async def connect(self, game: Game, query: str = "", subprotocols=None):
+        communicator = WebsocketCommunicator(
+            GameConsumer.as_asgi(), f"/api/connect/{game.id}{query}",
+            subprotocols=subprotocols,
+        )
+        communicator.scope["url_route"] = {"kwargs": {"game_id": game.id}}
+        return communicator, await communicator.connect()
+
+    async def test_token_in_query(self):
+        game = Game.create_game()
+        player = game.players[0]
+        communicator, (connected, _) = await self.connect(
+            game, f"?token={self.make_token(player.id)}"
+        )
+        self.assertTrue(connected)
+        self.assertTrue((await communicator.receive_json_from())["is_success"])
+        self.assertIn((game.id, player.id), GameConsumer.connects)
+        await communicator.disconnect()
+
+    async def test_token_in_subprotocol(self):
+        game = Game.create_game()
+        player = game.players[1]
+        communicator, (connected, subprotocol) = await self.connect(
+            game, subprotocols=["bearer", self.make_token(player.id)]
+        )
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, "bearer")
+        self.assertIn((game.id, player.id), GameConsumer.connects)
+        await communicator.disconnect()
+
+    async def test_bad_tokens_are_refused_before_accept(self):
+        game = Game.create_game()
+        for query, subprotocols in (
+            ("?token=garbage", None),
+            (f"?token={self.make_token(uuid4())}", None),
+            ("", ["bearer", "garbage"]),
+        ):
+            _, (connected, _) = await self.connect(game, query, subprotocols)
+            self.assertFalse(connected)
 
-# Create your tests here.
@@ -0,0 +1,30 @@
+import time
+
+
+class TokenBucket:
+    """Ведро токенов: capacity - допустимый всплеск, rate - токенов в секунду."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def consume(self, amount: float = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+        if self.tokens < amount:
+            return False
+
+        self.tokens -= amount
+        return True
+
+
+class FloodError(ValueError):
+    pass
@@ -4,8 +4,16 @@ from .views import *
 
 urlpatterns = [
     path('create', CreateView.as_view(), name='create'),
+    path('games/<uuid:game_id>/state', GameStateView.as_view(), name='game_state'),
 
     path('external/meta', ExternalMetaView.as_view(), name='external_meta'),
     path('external/create', ExternalCreateView.as_view(), name='external_create'),
     path('external/finish/<uuid:game_id>', ExternalFinishView.as_view(), name='external_finish'),
+    path('external/export', ExternalExportView.as_view(), name='external_export'),
+    path('external/games', ExternalGamesView.as_view(), name='external_games'),
+    path('external/tournaments', ExternalTournamentsView.as_view(), name='external_tournaments'),
+    path('external/tournaments/<uuid:tournament_id>', ExternalTournamentView.as_view(), name='external_tournament'),
+    path('external/ratings', ExternalRatingsView.as_view(), name='external_ratings'),
+    path('external/ratings/<uuid:player_id>', ExternalRatingView.as_view(), name='external_rating'),
+    path('external/debug/memory', ExternalMemoryView.as_view(), name='external_debug_memory'),
 ]
@@ -1,17 +1,77 @@
-import asyncio
 from uuid import UUID
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from django.views import View
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from app.auth import ExternalApiAuthentication
 from app.hr_platform import meta_dict
-from app.logic.game import Game
+from app.logic.archive import ResultsArchive
+from app.logic.dashboard import get_state
+from app.logic.enums import GameStatus, GameVariant, TournamentFormat
+from app.logic.game import DEFAULT_SYMBOLS, Game
+from app.logic import memory
+from app.logic.indexes import GameIndex
+from app.logic.rating import RatingBook
+from app.logic.tournament import Participant, Tournament, TournamentHub
+
+
+def get_variant(value: str | None) -> GameVariant:
+    if not value:
+        return GameVariant.CLASSIC
+
+    try:
+        return GameVariant(value)
+    except ValueError:
+        raise ValidationError(f"Неизвестный вариант игры: {value}")
+
+
+def get_int_option(params: dict, name: str) -> int | None:
+    """Необязательный целый параметр, пустое значение - None."""
+
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+
+    if isinstance(value, bool) or (
+        isinstance(value, float) and not value.is_integer()
+    ):
+        raise ValueError(f"Параметр {name} должен быть целым числом")
+
+    try:
+        return int(value) or None
+    except (TypeError, ValueError):
+        raise ValueError(f"Параметр {name} должен быть целым числом")
+
+
+def get_role_number(player: dict) -> int:
+    role = player["role"]
+    prefix, _, number = role.rpartition("_")
+    if (
+        prefix != "player"
+        or not number.isdigit()
+        or not 1 <= int(number) <= len(DEFAULT_SYMBOLS)
+    ):
+        raise ValidationError(f"Неизвестная роль: {role}")
+    return int(number)
 
 
 class CreateView(APIView):
     def post(self, request):
-        game = Game.create_game()
+        data = request.data
+        try:
+            game = Game.create_game(
+                variant=get_variant(data.get("variant")),
+                players_count=int(data.get("players_count") or 2),
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
         return Response({
             "game_id": game.id,
             "players": [
@@ -21,6 +81,40 @@ class CreateView(APIView):
         })
 
 
+class GameStateView(View):
+    """Состояние игры для клиентов без вебсокетов.
+
+    Отдаёт заранее закодированный снимок с ETag по версии игры.
+    С ?after_version= ждёт до STATE_POLL_TIMEOUT секунд, пока версия
+    не станет новее.
+    """
+
+    async def get(self, request, game_id: UUID):
+        game = Game.games.get(game_id)
+        if game is None:
+            return JsonResponse({"detail": "Игра не найдена"}, status=404)
+
+        after_version = request.GET.get("after_version")
+        if after_version is not None:
+            try:
+                after_version = int(after_version)
+            except ValueError:
+                return JsonResponse(
+                    {"detail": f"Неверная версия: {after_version}"}, status=400
+                )
+            await game.wait_changed(after_version, settings.STATE_POLL_TIMEOUT)
+
+        version, body = game.get_encoded_state()
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in etags or "*" in etags:
+            return HttpResponse(status=304, headers=headers)
+
+        return HttpResponse(body, content_type="application/json", headers=headers)
+
+
 class ExternalMetaView(APIView):
     def get(self, request):
         return Response(meta_dict)
@@ -33,25 +127,34 @@ class ExternalCreateView(APIView):
         data = request.data
         game_id = UUID(data["assessment_id"])
 
+        params = data["params"]
+
+        # Порядок ходов - по номеру роли: player_1, player_2, ...
         player_ids = []
         player_names = []
-        players = data["players"]
-        for player in players:
+        symbols = []
+        for player in sorted(data["players"], key=get_role_number):
             player_ids.append(UUID(player["uid"]))
             player_names.append(player["name"])
+            symbols.append(
+                params.get(f"symbol_{player['role']}")
+                or DEFAULT_SYMBOLS[get_role_number(player) - 1]
+            )
 
-        params = data["params"]
-        symbols = (params["symbol_player_1"], params["symbol_player_2"])
-        if players[0]["role"] == "player_2":
-            symbols = symbols[::-1]
-
-        Game.create_game(
-            game_id=game_id,
-            player_ids=player_ids,
-            player_names=player_names,
-            symbols=symbols,
-            is_external_created=True
-        )
+        try:
+            Game.create_game(
+                game_id=game_id,
+                player_ids=player_ids,
+                player_names=player_names,
+                symbols=tuple(symbols),
+                is_external_created=True,
+                turn_time_limit=get_int_option(params, "turn_time_limit"),
+                game_time_limit=get_int_option(params, "game_time_limit"),
+                variant=get_variant(params.get("variant")),
+                board_size=get_int_option(params, "board_size"),
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
 
         return Response()
 
@@ -61,5 +164,214 @@ class ExternalFinishView(APIView):
 
     def post(self, request, game_id: UUID):
         game = Game.get_game_by_id(game_id)
-        asyncio.run(game.finish_game())
+        async_to_sync(self.finish_game)(game)
         return Response()
+
+    @staticmethod
+    async def finish_game(game: Game):
+        # Под ASGI выполняется в цикле сервера, в очереди команд игры
+        await game.submit(game.finish_game)
+
+
+class ExternalExportView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    def get(self, request):
+        params = request.query_params
+
+        since = self.parse_datetime_param(params.get("since"))
+        until = self.parse_datetime_param(params.get("until"))
+
+        is_external_created = params.get("is_external_created")
+        if is_external_created is not None:
+            is_external_created = is_external_created.lower() == "true"
+
+        return StreamingHttpResponse(
+            ResultsArchive.instance().stream(
+                since=since,
+                until=until,
+                is_external_created=is_external_created,
+            ),
+            content_type="application/x-ndjson",
+        )
+
+    @staticmethod
+    def parse_datetime_param(value: str | None):
+        if value is None:
+            return None
+
+        parsed = parse_datetime(value)
+        if parsed is None or parsed.tzinfo is None:
+            raise ValidationError(f"Неверная дата: {value}")
+        return parsed
+
+
+class ExternalGamesView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    MAX_LIMIT = 500
+
+    def get(self, request):
+        params = request.query_params
+
+        try:
+            player_id = params.get("player_id")
+            player_id = UUID(player_id) if player_id else None
+
+            status = params.get("status")
+            status = GameStatus(status) if status else None
+
+            offset = max(int(params.get("offset", 0)), 0)
+            limit = min(max(int(params.get("limit", 50)), 1), self.MAX_LIMIT)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        is_external_created = params.get("is_external_created")
+        if is_external_created is not None:
+            is_external_created = is_external_created.lower() == "true"
+
+        game_ids = GameIndex.instance().query(
+            player_id=player_id,
+            status=status,
+            is_external_created=is_external_created,
+            offset=offset,
+            limit=limit,
+        )
+
+        results = []
+        for game_id in game_ids:
+            game = Game.games.get(game_id)
+            if game is not None:
+                results.append(get_state(game))
+
+        return Response({
+            "results": results,
+            "next_offset": offset + limit if len(game_ids) == limit else None,
+        })
+
+
+class ExternalMemoryView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    def get(self, request):
+        params = request.query_params
+
+        try:
+            limit = min(max(int(params.get("limit", 20)), 1), 200)
+            compare_to = params.get("compare_to")
+            compare_to = int(compare_to) if compare_to else None
+            include_objects = (
+                params.get("objects", "").lower() in ("1", "true")
+            )
+
+            return Response(
+                memory.report(limit, compare_to, include_objects)
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def post(self, request):
+        data = request.data
+        action = data.get("action")
+
+        try:
+            if action == "start":
+                memory.start_tracing(
+                    frames=int(data.get("frames", 1)),
+                    duration=float(data.get("duration", 60)),
+                )
+                return Response({"tracing": True})
+
+            if action == "stop":
+                memory.stop_tracing()
+                return Response({"tracing": False})
+
+            if action == "snapshot":
+                return Response({"snapshot_id": memory.take_snapshot()})
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        raise ValidationError(f"Неизвестное действие: {action}")
+
+
+class ExternalTournamentsView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    def post(self, request):
+        data = request.data
+        params = data.get("params") or {}
+
+        try:
+            participants = [
+                Participant(id=UUID(player["uid"]), name=player["name"], seed=seed)
+                for seed, player in enumerate(data["players"])
+            ]
+            tournament = Tournament(
+                participants,
+                format=TournamentFormat(data.get("format") or TournamentFormat.SWISS),
+                rounds=int(data.get("rounds") or 0) or None,
+                game_options={
+                    "variant": get_variant(params.get("variant")),
+                    "turn_time_limit": get_int_option(params, "turn_time_limit"),
+                    "game_time_limit": get_int_option(params, "game_time_limit"),
+                    "board_size": get_int_option(params, "board_size"),
+                },
+            )
+            TournamentHub.instance().create(tournament)
+        except KeyError as e:
+            raise ValidationError(f"Не хватает поля {e}")
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        return Response(tournament.get_state(limit=0))
+
+
+class ExternalTournamentView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    MAX_LIMIT = 500
+
+    def get(self, request, tournament_id: UUID):
+        params = request.query_params
+
+        try:
+            tournament = TournamentHub.instance().get_tournament(tournament_id)
+        except ValueError as e:
+            raise NotFound(str(e))
+
+        try:
+            offset = max(int(params.get("offset", 0)), 0)
+            limit = min(max(int(params.get("limit", 50)), 1), self.MAX_LIMIT)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        return Response(tournament.get_state(limit, offset))
+
+
+class ExternalRatingsView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    MAX_LIMIT = 500
+
+    def get(self, request):
+        params = request.query_params
+
+        try:
+            offset = max(int(params.get("offset", 0)), 0)
+            limit = min(max(int(params.get("limit", 50)), 1), self.MAX_LIMIT)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        return Response(RatingBook.instance().get_leaderboard(limit, offset))
+
+
+class ExternalRatingView(APIView):
+    authentication_classes = [ExternalApiAuthentication]
+
+    def get(self, request, player_id: UUID):
+        try:
+            state = RatingBook.instance().get_player_state(player_id)
+        except ValueError as e:
+            raise NotFound(str(e))
+
+        return Response(state)
@@ -14,16 +14,39 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 from django.urls import path
 
-from app.consumers import GameConsumer
+from app.consumers import (
+    DashboardConsumer,
+    GameConsumer,
+    MatchmakingConsumer,
+    MultiplexConsumer,
+    SpectatorConsumer,
+    TournamentConsumer,
+)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoProject.settings')
 
+http_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from app import logs  # noqa: E402
+from app.logic import snapshot  # noqa: E402
+
+logs.install(settings.LOG_QUEUE_SIZE, settings.LOG_REPEAT_WINDOW)
+snapshot.install(settings.SNAPSHOT_PATH)
+
 application = ProtocolTypeRouter({
-    'http': get_asgi_application(),
+    'http': http_application,
     'websocket': AuthMiddlewareStack(
         URLRouter([
             path('api/connect/<uuid:game_id>', GameConsumer.as_asgi()),
-            path('api/connect/<uuid:game_id>/<uuid:player_id>', GameConsumer.as_asgi())
+            path('api/connect/<uuid:game_id>/<uuid:player_id>', GameConsumer.as_asgi()),
+            path('api/watch/<uuid:game_id>', SpectatorConsumer.as_asgi()),
+            path('api/matchmaking', MatchmakingConsumer.as_asgi()),
+            path('api/multiplex', MultiplexConsumer.as_asgi()),
+            path('api/dashboard', DashboardConsumer.as_asgi()),
+            path('api/tournament/<uuid:tournament_id>', TournamentConsumer.as_asgi()),
+            path('api/tournament/<uuid:tournament_id>/<uuid:player_id>', TournamentConsumer.as_asgi()),
         ])
     )
 })
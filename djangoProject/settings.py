@@ -44,6 +44,25 @@ HR_AUDIENCE = os.environ["HR_AUDIENCE"]
 
 VERIFY_EXPIRATION = os.environ["VERIFY_EXPIRATION"] == "True"
 
+MOVE_LOG_DIR = Path(os.environ.get("MOVE_LOG_DIR", BASE_DIR / "move_logs"))
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+RESULTS_ARCHIVE_PATH = Path(os.environ.get(
+    "RESULTS_ARCHIVE_PATH", BASE_DIR / "results" / "games.ndjson"
+))
+RATINGS_PATH = Path(os.environ.get(
+    "RATINGS_PATH", BASE_DIR / "results" / "ratings.ndjson"
+))
+ENDED_GAME_TTL = int(os.environ.get("ENDED_GAME_TTL", 3600))
+IDLE_GAME_TTL = int(os.environ.get("IDLE_GAME_TTL", 3600))
+
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", 15))
+HEARTBEAT_TIMEOUT = float(os.environ.get("HEARTBEAT_TIMEOUT", 45))
+
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_REPEAT_WINDOW = float(os.environ.get("LOG_REPEAT_WINDOW", 10))
+
+STATE_POLL_TIMEOUT = float(os.environ.get("STATE_POLL_TIMEOUT", 25))
+
 
 # Application definition
 
@@ -58,6 +77,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+
+    'app',
 ]
 
 MIDDLEWARE = [